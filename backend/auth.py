@@ -0,0 +1,116 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+def scope_bot_ids(requested: Optional[List[str]], allowed: Optional[List[str]]) -> Optional[List[str]]:
+    """Restrict requested bot ids to the ones the caller may see.
+
+    None means "no restriction" for both arguments; an empty result means
+    the caller can see none of the requested bots.
+    """
+    if allowed is None:
+        return requested
+    if requested is None:
+        return list(allowed)
+    return [bot_id for bot_id in requested if bot_id in allowed]
+
+
+class TokenCache:
+    """LRU cache of users by access token with a time-to-live"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # token -> (expires_at, user)
+
+    def get(self, token: str) -> Optional[dict]:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return entry[1]
+
+    def put(self, token: str, user: dict):
+        self._entries[token] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def remove_user(self, user_id: str):
+        for token, (_, user) in list(self._entries.items()):
+            if user["id"] == user_id:
+                del self._entries[token]
+
+
+class AccessControl:
+    """Resolves API callers from their access token.
+
+    Users are kept in an LRU/TTL cache by token, so authenticating a request
+    is a dict lookup; misses go to the unique `users.access_token` index.
+    The user management endpoints invalidate changed users explicitly.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self._cache = TokenCache(
+            max_size=int(os.environ.get("AUTH_CACHE_SIZE", "10000")),
+            ttl=float(os.environ.get("AUTH_CACHE_TTL_SECONDS", "300"))
+        )
+
+    async def ensure_indexes(self):
+        await self.db.users.create_index("access_token", unique=True)
+        try:
+            await self.db.users.create_index("username", unique=True)
+        except PyMongoError as e:
+            logger.error(f"Failed to create unique username index: {e}")
+
+    async def get_user(self, token: Optional[str]) -> Optional[dict]:
+        if not token:
+            return None
+        user = self._cache.get(token)
+        if user is None:
+            user = await self.db.users.find_one(
+                {"access_token": token}, {"_id": 0, "password": 0}
+            )
+            if user:
+                self._cache.put(token, user)
+        return user
+
+    async def get_allowed_bot_ids(self, token: Optional[str]) -> Optional[List[str]]:
+        """Bots the caller is restricted to, None if unrestricted.
+
+        Admins and users who were never assigned bots see every bot, same as
+        the panel has always done. A `restricted` user stays limited to their
+        list even once it is empty, e.g. after their last bot was deleted.
+        """
+        user = await self.get_user(token)
+        if not user or user.get("role") == "admin":
+            return None
+        if not user.get("restricted") and not user.get("bot_ids"):
+            return None
+        return list(user.get("bot_ids") or [])
+
+    def invalidate_user(self, user_id: str):
+        """Drop cached entries of a user after it was changed or deleted"""
+        self._cache.remove_user(user_id)
+
+
+# Global instance
+access_control: Optional[AccessControl] = None
+
+def get_access_control(db: AsyncIOMotorDatabase) -> AccessControl:
+    global access_control
+    if access_control is None:
+        access_control = AccessControl(db)
+    return access_control
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+from typing import Dict, List
+
+import httpx
+from starlette.types import ASGIApp
+
+logger = logging.getLogger(__name__)
+
+# Request headers passed on to every sub-operation
+FORWARDED_HEADERS = ("authorization", "accept-language")
+
+
+class BatchExecutor:
+    """Runs batches of API operations against the app in-process.
+
+    Every operation goes through the normal routing, auth and validation of
+    the ASGI app, without a network hop. Operations run concurrently, at
+    most `concurrency` at a time, except that one listing others in
+    `depends_on` starts only after they finished.
+    """
+
+    def __init__(self, app: ASGIApp, prefix: str, concurrency: int):
+        self.app = app
+        self.prefix = prefix
+        self.concurrency = concurrency
+
+    def validate(self, operations: List[dict]):
+        """Raise ValueError for a batch that can't be run"""
+        ids = [op["id"] for op in operations]
+        if len(set(ids)) != len(ids):
+            raise ValueError("Operation ids must be unique")
+        position = {op_id: index for index, op_id in enumerate(ids)}
+        for index, op in enumerate(operations):
+            if not op["path"].startswith("/") or op["path"].startswith("/batch"):
+                raise ValueError(f"Invalid path for operation {op['id']}: {op['path']}")
+            for dependency in op["depends_on"]:
+                # Only earlier operations, which also rules out cycles
+                if position.get(dependency, index) >= index:
+                    raise ValueError(f"Operation {op['id']} depends on unknown or later operation {dependency}")
+
+    async def run(self, operations: List[dict], headers: Dict[str, str]) -> List[dict]:
+        """Results of all operations, in request order"""
+        forwarded = {name: value for name, value in headers.items() if name.lower() in FORWARDED_HEADERS}
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks: Dict[str, asyncio.Task] = {}
+
+        transport = httpx.ASGITransport(app=self.app)
+        # Identity: compressing sub-responses only for httpx to decompress them costs CPU
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://batch", headers={"Accept-Encoding": "identity"}
+        ) as client:
+
+            async def run_operation(op: dict) -> dict:
+                for dependency in op["depends_on"]:
+                    result = await tasks[dependency]
+                    if result["status"] >= 400:
+                        return {"id": op["id"], "status": 424, "body": {"detail": f"Dependency {dependency} failed"}}
+                async with semaphore:
+                    return await self._request(client, op, forwarded)
+
+            for op in operations:
+                tasks[op["id"]] = asyncio.create_task(run_operation(op))
+            return list(await asyncio.gather(*tasks.values()))
+
+    async def _request(self, client: httpx.AsyncClient, op: dict, headers: Dict[str, str]) -> dict:
+        try:
+            response = await client.request(
+                op["method"],
+                self.prefix + op["path"],
+                params=op.get("params"),
+                json=op.get("body"),
+                headers=headers
+            )
+        except Exception as e:
+            logger.error(f"Batch operation {op['id']} failed: {e}")
+            return {"id": op["id"], "status": 500, "body": {"detail": str(e)}}
+        try:
+            body = response.json() if response.content else None
+        except ValueError:
+            # Not JSON, or not even text (UnicodeDecodeError)
+            body = response.text
+        return {"id": op["id"], "status": response.status_code, "body": body}
@@ -0,0 +1,65 @@
+import asyncio
+from typing import Dict, Hashable, Iterable, List, Optional, Set
+
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+
+
+class BatchLoader:
+    """DataLoader-style loader of documents by key.
+
+    `load` calls made in the same event loop turn are collected and resolved
+    with a single `$in` query; each key is fetched at most once per loader.
+    A loader lives for one request, so its results are never stale.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, key: str = "id", projection: Optional[dict] = None):
+        self.collection = collection
+        self.key = key
+        self.projection = projection or {"_id": 0}
+        self._futures: Dict[Hashable, asyncio.Future] = {}
+        self._pending: List[Hashable] = []
+        # Running dispatches; the event loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+    def load(self, key: Hashable) -> "asyncio.Future[Optional[dict]]":
+        """Document with the given key, None if there is none"""
+        future = self._futures.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._futures[key] = future
+            if not self._pending:
+                asyncio.get_running_loop().call_soon(self._start_dispatch)
+            self._pending.append(key)
+        return future
+
+    async def load_many(self, keys: Iterable[Hashable]) -> List[Optional[dict]]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def _start_dispatch(self):
+        keys, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._dispatch(keys))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, keys: List[Hashable]):
+        try:
+            documents = await self.collection.find(
+                {self.key: {"$in": keys}}, self.projection
+            ).to_list(None)
+        except Exception as e:
+            for key in keys:
+                self._futures.pop(key).set_exception(e)
+            return
+        by_key = {doc[self.key]: doc for doc in documents}
+        for key in keys:
+            future = self._futures[key]
+            if not future.done():
+                future.set_result(by_key.get(key))
+
+
+class RequestLoaders:
+    """Batch loaders shared by everything that runs for one request"""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.bots = BatchLoader(db.bots, projection={"_id": 0, "token": 0})
+        self.bot_menus = BatchLoader(db.bot_menus)
@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING
+
+from auth import get_access_control
+from chat_counts import get_chat_counts
+from typeahead import get_typeahead_index
+from versions import get_resource_versions
+from config_cache import get_config_cache
+
+logger = logging.getLogger(__name__)
+
+# Collections holding per-bot documents, deleted in this order.
+# Messages go first: they are the bulk of the data and useless without chats.
+BOT_DATA_COLLECTIONS = [
+    "messages",
+    "message_archive",
+    "chats",
+    "timers",
+    "welcome_messages",
+    "bot_menu_assignments",
+]
+
+
+class BotDeletionManager:
+    """Deletes everything that belongs to a removed bot in the background.
+
+    Documents are removed in `_id` order in throttled batches, with the
+    current collection and last deleted `_id` checkpointed in
+    `bot_deletion_jobs` after every batch, so a restart resumes the job
+    where it stopped instead of rescanning deleted ranges.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.batch_size = int(os.environ.get("BOT_DELETE_BATCH_SIZE", "1000"))
+        # Pause between batches so deletion doesn't starve live traffic
+        self.batch_delay = float(os.environ.get("BOT_DELETE_BATCH_DELAY_MS", "50")) / 1000
+        self.tasks: Dict[str, asyncio.Task] = {}
+
+    async def ensure_indexes(self):
+        for name in BOT_DATA_COLLECTIONS:
+            await self.db[name].create_index([("bot_id", ASCENDING), ("_id", ASCENDING)])
+        await self.db.bot_deletion_jobs.create_index("bot_id")
+
+    async def start_deletion(self, bot_id: str) -> dict:
+        """Create deletion job for bot data and run it in background"""
+        existing = await self.db.bot_deletion_jobs.find_one(
+            {"bot_id": bot_id, "status": {"$in": ["pending", "running"]}}, {"_id": 0}
+        )
+        if existing:
+            return existing
+
+        job = {
+            "id": str(uuid.uuid4()),
+            "bot_id": bot_id,
+            "status": "pending",
+            "collection": BOT_DATA_COLLECTIONS[0],
+            "last_id": None,
+            "deleted": {name: 0 for name in BOT_DATA_COLLECTIONS},
+            "error": None,
+            "created_at": datetime.now(timezone.utc),
+            "updated_at": datetime.now(timezone.utc)
+        }
+        await self.db.bot_deletion_jobs.insert_one(job)
+        job.pop("_id", None)
+        self._spawn(job)
+        return job
+
+    async def get_job(self, bot_id: str) -> Optional[dict]:
+        """Get latest deletion job for bot"""
+        jobs = await self.db.bot_deletion_jobs.find(
+            {"bot_id": bot_id}, {"_id": 0}
+        ).sort("created_at", -1).limit(1).to_list(1)
+        return jobs[0] if jobs else None
+
+    async def resume_pending(self):
+        """Restart deletion jobs interrupted by a shutdown"""
+        jobs = await self.db.bot_deletion_jobs.find(
+            {"status": {"$in": ["pending", "running"]}}, {"_id": 0}
+        ).to_list(None)
+        for job in jobs:
+            logger.info(f"Resuming deletion of bot {job['bot_id']}")
+            self._spawn(job)
+
+    async def stop(self):
+        """Interrupt running jobs; they resume from their checkpoint on next startup"""
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _spawn(self, job: dict):
+        task = asyncio.create_task(self._run(job))
+        self.tasks[job["id"]] = task
+        task.add_done_callback(lambda _: self.tasks.pop(job["id"], None))
+
+    async def _run(self, job: dict):
+        job_id = job["id"]
+        bot_id = job["bot_id"]
+        deleted = dict(job["deleted"])
+        start_index = BOT_DATA_COLLECTIONS.index(job["collection"])
+        last_id = job.get("last_id")
+
+        try:
+            await self.db.bot_deletion_jobs.update_one(
+                {"id": job_id},
+                {"$set": {"status": "running", "updated_at": datetime.now(timezone.utc)}}
+            )
+
+            for name in BOT_DATA_COLLECTIONS[start_index:]:
+                collection = self.db[name]
+                while True:
+                    query = {"bot_id": bot_id}
+                    if last_id is not None:
+                        query["_id"] = {"$gt": last_id}
+                    ids = [
+                        doc["_id"] for doc in await collection.find(query, {"_id": 1})
+                        .sort("_id", ASCENDING).limit(self.batch_size).to_list(self.batch_size)
+                    ]
+                    if not ids:
+                        break
+
+                    result = await collection.delete_many({"_id": {"$in": ids}})
+                    deleted[name] += result.deleted_count
+                    if name == "chats":
+                        get_resource_versions().bump("chats", bot_id)
+                    elif name in ("messages", "message_archive"):
+                        get_resource_versions().bump("messages")
+                    elif name == "welcome_messages":
+                        get_config_cache(self.db).invalidate("welcome_messages")
+                    last_id = ids[-1]
+                    await self.db.bot_deletion_jobs.update_one(
+                        {"id": job_id},
+                        {"$set": {
+                            "collection": name,
+                            "last_id": last_id,
+                            "deleted": deleted,
+                            "updated_at": datetime.now(timezone.utc)
+                        }}
+                    )
+                    await asyncio.sleep(self.batch_delay)
+
+                last_id = None
+
+            # Drop references to the bot kept outside of its own data. Users
+            # stay restricted, so losing their last bot doesn't open up all bots.
+            user_ids = await self.db.users.distinct("id", {"bot_ids": bot_id})
+            await self.db.users.update_many(
+                {"bot_ids": bot_id},
+                {"$pull": {"bot_ids": bot_id}, "$set": {"restricted": True}}
+            )
+            for user_id in user_ids:
+                get_access_control(self.db).invalidate_user(user_id)
+            get_chat_counts(self.db).invalidate()
+            get_typeahead_index(self.db).remove_bot(bot_id)
+
+            await self.db.bot_deletion_jobs.update_one(
+                {"id": job_id},
+                {"$set": {
+                    "status": "completed",
+                    "deleted": deleted,
+                    "updated_at": datetime.now(timezone.utc)
+                }}
+            )
+            logger.info(f"Deleted data of bot {bot_id}: {deleted}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Deletion of bot {bot_id} failed: {e}")
+            await self.db.bot_deletion_jobs.update_one(
+                {"id": job_id},
+                {"$set": {
+                    "status": "failed",
+                    "error": str(e),
+                    "updated_at": datetime.now(timezone.utc)
+                }}
+            )
+
+
+# Global instance
+bot_deletion_manager: Optional[BotDeletionManager] = None
+
+def get_bot_deletion_manager(db: AsyncIOMotorDatabase) -> BotDeletionManager:
+    global bot_deletion_manager
+    if bot_deletion_manager is None:
+        bot_deletion_manager = BotDeletionManager(db)
+    return bot_deletion_manager
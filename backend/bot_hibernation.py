@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from telegram.error import InvalidToken
+
+from telegram_manager import TelegramBotManager
+
+logger = logging.getLogger(__name__)
+
+
+class BotHibernator:
+    """Parks idle bots and wakes them when updates arrive.
+
+    A running bot that received no update for `idle_minutes` is hibernated:
+    its Application, update queue and long-polling task are dropped and only
+    its Bot is kept. Every `poll_seconds` one shared pass asks Telegram
+    whether any hibernating bot has pending updates (getUpdates with no
+    offset and no timeout, which confirms nothing) and wakes the bots that
+    do; their full dispatcher then receives those updates as usual.
+    """
+
+    def __init__(self, manager: TelegramBotManager):
+        self.manager = manager
+        self.idle_minutes = float(os.environ.get("BOT_HIBERNATE_AFTER_MINUTES", "30"))
+        self.poll_seconds = float(os.environ.get("BOT_HIBERNATION_POLL_SECONDS", "30"))
+        self.concurrency = int(os.environ.get("BOT_HIBERNATION_CONCURRENCY", "20"))
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start hibernating idle bots in background"""
+        if self.idle_minutes > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Bot hibernation pass failed: {e}")
+
+    async def check(self):
+        """Hibernate idle bots, then wake hibernating ones with pending updates"""
+        cutoff = time.monotonic() - self.idle_minutes * 60
+        for bot_id in list(self.manager.applications):
+            if self.manager.activity.get(bot_id, cutoff) < cutoff:
+                await self.manager.hibernate(bot_id)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def probe(bot_id: str):
+            async with semaphore:
+                state = self.manager.get_state(bot_id)
+                if state is None or state["state"] != "hibernating":
+                    return
+                try:
+                    updates = await self.manager.bots[bot_id].get_updates(limit=1, timeout=0)
+                except InvalidToken as e:
+                    await self.manager.quarantine(bot_id, str(e))
+                    return
+                except Exception as e:
+                    logger.warning(f"Polling hibernating bot {bot_id} failed: {e}")
+                    return
+                if updates:
+                    try:
+                        await self.manager.wake(bot_id)
+                    except Exception as e:
+                        # The supervisor retries failed bots
+                        logger.error(f"Failed to wake bot {bot_id}: {e}")
+
+        hibernating = [
+            bot_id for bot_id, state in self.manager.states.items()
+            if state["state"] == "hibernating"
+        ]
+        await asyncio.gather(*(probe(bot_id) for bot_id in hibernating))
+
+
+# Global instance
+bot_hibernator: Optional[BotHibernator] = None
+
+def get_bot_hibernator(manager: TelegramBotManager) -> BotHibernator:
+    global bot_hibernator
+    if bot_hibernator is None:
+        bot_hibernator = BotHibernator(manager)
+    return bot_hibernator
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from telegram.error import InvalidToken
+
+from config_cache import get_config_cache
+from telegram_manager import TelegramBotManager
+
+logger = logging.getLogger(__name__)
+
+
+class BotSupervisor:
+    """Keeps every active bot polling.
+
+    Each pass compares the active bots in the database with the manager's
+    state. A running bot whose getUpdates has not succeeded for
+    `stall_seconds` (dead polling task, conflicting instance, network
+    outage) is stopped and restarted; restarts that fail are retried with
+    jittered exponential backoff, so a broken bot costs one attempt per
+    backoff period instead of a busy loop. Bots whose token Telegram
+    rejects are quarantined and left alone until they are toggled on again.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase, manager: TelegramBotManager):
+        self.db = db
+        self.manager = manager
+        self.config_cache = get_config_cache(db)
+        self.interval_seconds = float(os.environ.get("BOT_SUPERVISOR_INTERVAL_SECONDS", "15"))
+        self.stall_seconds = float(os.environ.get("BOT_STALL_SECONDS", "120"))
+        self.backoff_seconds = float(os.environ.get("BOT_RESTART_BACKOFF_SECONDS", "5"))
+        self.max_backoff_seconds = float(os.environ.get("BOT_RESTART_MAX_BACKOFF_SECONDS", "900"))
+        self._failures: Dict[str, int] = {}
+        self._retry_at: Dict[str, float] = {}  # bot_id -> monotonic time of next restart
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start supervising in background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def reset(self, bot_id: str):
+        """Forget a bot's failures, e.g. after it was started or stopped by hand"""
+        self._failures.pop(bot_id, None)
+        self._retry_at.pop(bot_id, None)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Bot supervision failed: {e}")
+
+    async def check(self):
+        """One supervision pass over all active bots"""
+        for bot in await self.config_cache.get("bots"):
+            if bot.get("is_active", True) and not bot.get("quarantined_at"):
+                await self._check_bot(bot)
+
+    async def _check_bot(self, bot: dict):
+        bot_id = bot["id"]
+        state = self.manager.get_state(bot_id)
+        if state is None or state["state"] in ("pending", "starting", "hibernating", "quarantined"):
+            # Not started yet, a start is in progress elsewhere, or left to the hibernator
+            return
+
+        if state["state"] == "running":
+            last_ok, error = self.manager.polls.get(bot_id, (time.monotonic(), None))
+            if isinstance(error, InvalidToken):
+                await self.manager.quarantine(bot_id, str(error))
+                return
+            if time.monotonic() - last_ok < self.stall_seconds:
+                self.reset(bot_id)
+                return
+            reason = f"No successful poll for {int(time.monotonic() - last_ok)}s"
+            if error is not None:
+                reason += f": {error}"
+            logger.warning(f"Bot {bot_id} is unhealthy, restarting. {reason}")
+            await self.manager.remove_bot(bot_id)
+            self._schedule_retry(bot_id, reason)
+            return
+
+        # failed or stopped while still active
+        if time.monotonic() < self._retry_at.get(bot_id, 0):
+            return
+        try:
+            await self.manager.start_stored_bot(bot)
+        except Exception as e:
+            if self.manager.get_state(bot_id)["state"] != "quarantined":
+                self._schedule_retry(bot_id, str(e))
+            return
+        logger.info(f"Restarted bot {bot_id}")
+
+    def _schedule_retry(self, bot_id: str, error: str):
+        failures = self._failures.get(bot_id, 0) + 1
+        self._failures[bot_id] = failures
+        backoff = min(self.max_backoff_seconds, self.backoff_seconds * 2 ** (failures - 1))
+        # Jitter spreads out retries of bots that failed together
+        delay = random.uniform(backoff / 2, backoff)
+        self._retry_at[bot_id] = time.monotonic() + delay
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+        self.manager.set_state(bot_id, "failed", error, retry_at)
+        logger.info(f"Retrying bot {bot_id} in {delay:.0f}s (failure {failures})")
+
+
+# Global instance
+bot_supervisor: Optional[BotSupervisor] = None
+
+def get_bot_supervisor(db: AsyncIOMotorDatabase, manager: TelegramBotManager) -> BotSupervisor:
+    global bot_supervisor
+    if bot_supervisor is None:
+        bot_supervisor = BotSupervisor(db, manager)
+    return bot_supervisor
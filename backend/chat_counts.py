@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+logger = logging.getLogger(__name__)
+
+# Chat fields that affect the counts
+COUNTED_FIELDS = {"_id": 0, "bot_id": 1, "label_ids": 1, "bot_status": 1, "unread_count": 1}
+
+FACET_PIPELINE = [
+    {"$facet": {
+        "by_bot": [
+            {"$group": {
+                "_id": "$bot_id",
+                "chats": {"$sum": 1},
+                "unread_chats": {"$sum": {"$cond": [{"$gt": ["$unread_count", 0]}, 1, 0]}},
+                "unread_messages": {"$sum": {"$ifNull": ["$unread_count", 0]}}
+            }}
+        ],
+        "by_label": [
+            {"$unwind": "$label_ids"},
+            {"$group": {"_id": {"bot_id": "$bot_id", "label_id": "$label_ids"}, "count": {"$sum": 1}}}
+        ],
+        "by_status": [
+            {"$group": {
+                "_id": {"bot_id": "$bot_id", "status": {"$ifNull": ["$bot_status", "active"]}},
+                "count": {"$sum": 1}
+            }}
+        ]
+    }}
+]
+
+
+def _empty_bot_counts() -> dict:
+    return {
+        "chats": 0,
+        "unread_chats": 0,
+        "unread_messages": 0,
+        "labels": defaultdict(int),
+        "bot_status": defaultdict(int)
+    }
+
+
+class ChatCounts:
+    """In-memory per-bot chat counts for the sidebar.
+
+    Counts are loaded once with a `$facet` aggregation and then kept up to
+    date by `apply_change`, which the write paths call with a chat's counted
+    fields before and after their update. Bulk writes that can't cheaply
+    report their changes call `invalidate` instead; the next read then
+    recomputes, at most once per `refresh_interval` seconds.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.refresh_interval = float(os.environ.get("CHAT_COUNTS_REFRESH_SECONDS", "5"))
+        self._bots: Dict[str, dict] = defaultdict(_empty_bot_counts)
+        self._loaded = False
+        self._dirty = False
+        self._changed_during_refresh = False
+        self._refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def refresh(self):
+        """Recompute all counts from the chats collection"""
+        async with self._lock:
+            self._changed_during_refresh = False
+            result = await self.db.chats.aggregate(FACET_PIPELINE).to_list(1)
+            facets = result[0] if result else {"by_bot": [], "by_label": [], "by_status": []}
+
+            bots = defaultdict(_empty_bot_counts)
+            for row in facets["by_bot"]:
+                counts = bots[row["_id"]]
+                counts["chats"] = row["chats"]
+                counts["unread_chats"] = row["unread_chats"]
+                counts["unread_messages"] = row["unread_messages"]
+            for row in facets["by_label"]:
+                bots[row["_id"]["bot_id"]]["labels"][row["_id"]["label_id"]] = row["count"]
+            for row in facets["by_status"]:
+                bots[row["_id"]["bot_id"]]["bot_status"][row["_id"]["status"]] = row["count"]
+
+            self._bots = bots
+            self._loaded = True
+            # Deltas applied while aggregating may or may not be included
+            self._dirty = self._changed_during_refresh
+            self._refreshed_at = time.monotonic()
+
+    def invalidate(self):
+        """Mark counts as stale after a bulk write"""
+        self._dirty = True
+
+    def apply_change(self, before: Optional[dict], after: Optional[dict]):
+        """Apply the difference between two versions of a chat's counted fields.
+
+        `before` is None for a newly created chat, `after` is None for a
+        deleted one.
+        """
+        if not self._loaded:
+            return
+        if self._lock.locked():
+            self._changed_during_refresh = True
+        if before:
+            self._add(before, -1)
+        if after:
+            self._add(after, 1)
+
+    def _add(self, chat: dict, sign: int):
+        counts = self._bots[chat["bot_id"]]
+        unread = chat.get("unread_count") or 0
+        counts["chats"] += sign
+        counts["unread_messages"] += sign * unread
+        if unread > 0:
+            counts["unread_chats"] += sign
+        for label_id in chat.get("label_ids") or []:
+            counts["labels"][label_id] += sign
+        counts["bot_status"][chat.get("bot_status") or "active"] += sign
+
+    async def get_facets(self, bot_ids: Optional[List[str]] = None) -> dict:
+        """Get counts per bot, label and bot status, for the given bots only if not None"""
+        stale = self._dirty and time.monotonic() - self._refreshed_at >= self.refresh_interval
+        if not self._loaded or stale:
+            await self.refresh()
+
+        selected = bot_ids if bot_ids is not None else list(self._bots.keys())
+        facets = {
+            "total_chats": 0,
+            "unread_chats": 0,
+            "unread_messages": 0,
+            "by_bot": {},
+            "by_label": defaultdict(int),
+            "by_bot_status": defaultdict(int)
+        }
+        for bot_id in selected:
+            counts = self._bots.get(bot_id)
+            if not counts or counts["chats"] <= 0:
+                continue
+            facets["total_chats"] += counts["chats"]
+            facets["unread_chats"] += counts["unread_chats"]
+            facets["unread_messages"] += counts["unread_messages"]
+            facets["by_bot"][bot_id] = {
+                "chats": counts["chats"],
+                "unread_chats": counts["unread_chats"],
+                "unread_messages": counts["unread_messages"]
+            }
+            for label_id, count in counts["labels"].items():
+                if count > 0:
+                    facets["by_label"][label_id] += count
+            for status, count in counts["bot_status"].items():
+                if count > 0:
+                    facets["by_bot_status"][status] += count
+
+        facets["by_label"] = dict(facets["by_label"])
+        facets["by_bot_status"] = dict(facets["by_bot_status"])
+        return facets
+
+
+# Global instance
+chat_counts: Optional[ChatCounts] = None
+
+def get_chat_counts(db: AsyncIOMotorDatabase) -> ChatCounts:
+    global chat_counts
+    if chat_counts is None:
+        chat_counts = ChatCounts(db)
+    return chat_counts
@@ -0,0 +1,135 @@
+import logging
+import os
+import re
+import unicodedata
+from typing import Iterable, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, TEXT, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+MIN_GRAM = 1
+MAX_GRAM = 20
+# Bump when search_terms() changes, so backfill recomputes stored terms
+SEARCH_TERMS_VERSION = 2
+
+# Any Unicode letter or digit is part of a word (і, ї, є, é, ü, ...)
+_NON_WORD = re.compile(r"\W+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase and fold Cyrillic ё to е so both spellings match"""
+    text = unicodedata.normalize("NFC", text or "").lower().replace("ё", "е")
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def search_terms(*names: Optional[str]) -> List[str]:
+    """Edge n-grams of every word of chat names (username, first/last name).
+
+    "Иван" -> ["и", "ив", "ива", "иван"], so any word prefix is an exact
+    match on the multikey `chats.search_terms` index.
+    """
+    terms = set()
+    for name in names:
+        for word in normalize(name).split():
+            word = word[:MAX_GRAM]
+            for size in range(MIN_GRAM, len(word) + 1):
+                terms.add(word[:size])
+    return sorted(terms)
+
+
+def query_terms(query: str) -> List[str]:
+    """Terms of a search query to match against `search_terms`"""
+    return [word[:MAX_GRAM] for word in normalize(query).split()]
+
+
+class ChatSearch:
+    """Indexed search over chat names and message text.
+
+    Chat names are matched through word-prefix n-grams stored on the chat
+    (`search_terms`), message bodies through a Russian-stemmed Mongo text
+    index ranked by text score.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        # Hard cap on message search time so latency stays predictable
+        self.max_time_ms = int(os.environ.get("SEARCH_MAX_TIME_MS", "2000"))
+
+    async def ensure_indexes(self):
+        await self.db.chats.create_index([("search_terms", ASCENDING), ("last_message_time", -1)])
+        await self.db.messages.create_index(
+            [("text", TEXT)], default_language="russian", name="messages_text"
+        )
+
+    async def backfill(self, batch_size: int = 1000):
+        """Compute search_terms for chats created before search existed or its last change"""
+        total = 0
+        while True:
+            chats = await self.db.chats.find(
+                {"search_terms_version": {"$ne": SEARCH_TERMS_VERSION}},
+                {"_id": 1, "username": 1, "first_name": 1, "last_name": 1}
+            ).limit(batch_size).to_list(batch_size)
+            if not chats:
+                break
+            await self.db.chats.bulk_write([
+                UpdateOne({"_id": chat["_id"]}, {"$set": {
+                    "search_terms": search_terms(
+                        chat.get("username"), chat.get("first_name"), chat.get("last_name")
+                    ),
+                    "search_terms_version": SEARCH_TERMS_VERSION
+                }})
+                for chat in chats
+            ], ordered=False)
+            total += len(chats)
+        if total:
+            logger.info(f"Indexed names of {total} chats for search")
+
+    async def search_chats(
+        self, query: str, bot_ids: Optional[Iterable[str]], offset: int, limit: int
+    ) -> List[dict]:
+        terms = query_terms(query)
+        if not terms or (bot_ids is not None and not bot_ids):
+            return []
+        mongo_query = {"search_terms": {"$all": terms}}
+        if bot_ids is not None:
+            mongo_query["bot_id"] = {"$in": list(bot_ids)}
+        return await self.db.chats.find(
+            mongo_query, {"_id": 0, "search_terms": 0}
+        ).sort("last_message_time", -1).skip(offset).limit(limit).to_list(limit)
+
+    async def search_messages(
+        self, query: str, bot_ids: Optional[Iterable[str]], offset: int, limit: int
+    ) -> List[dict]:
+        """Messages ranked by relevance, each with its chat"""
+        if not normalize(query) or (bot_ids is not None and not bot_ids):
+            return []
+        mongo_query = {"$text": {"$search": query}}
+        if bot_ids is not None:
+            mongo_query["bot_id"] = {"$in": list(bot_ids)}
+        messages = await self.db.messages.find(
+            mongo_query, {"_id": 0, "score": {"$meta": "textScore"}}
+        ).sort([("score", {"$meta": "textScore"})]).skip(offset).limit(limit).max_time_ms(
+            self.max_time_ms
+        ).to_list(limit)
+
+        chat_ids = list({msg["chat_id"] for msg in messages})
+        chats = await self.db.chats.find(
+            {"id": {"$in": chat_ids}}, {"_id": 0, "search_terms": 0}
+        ).to_list(None)
+        chats_by_id = {chat["id"]: chat for chat in chats}
+        return [
+            {"message": msg, "chat": chats_by_id.get(msg["chat_id"]), "score": msg.pop("score", 0)}
+            for msg in messages
+        ]
+
+
+# Global instance
+chat_search: Optional[ChatSearch] = None
+
+def get_chat_search(db: AsyncIOMotorDatabase) -> ChatSearch:
+    global chat_search
+    if chat_search is None:
+        chat_search = ChatSearch(db)
+    return chat_search
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from versions import get_resource_versions
+
+logger = logging.getLogger(__name__)
+
+# Small, read-mostly collections kept in memory
+CONFIG_COLLECTIONS = (
+    "bots",
+    "labels",
+    "quick_replies",
+    "auto_replies",
+    "welcome_messages",
+    "menu_buttons",
+    "bot_menus",
+)
+
+
+class ConfigCache:
+    """In-process copy of the config collections.
+
+    Each collection is loaded whole on first read and served from memory
+    afterwards. Write handlers call `invalidate`, which bumps the
+    collection's version in `ResourceVersions`; a copy loaded under an older
+    version is reloaded on the next read, including one that was still
+    loading when the write happened.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.versions = get_resource_versions()
+        self._documents: Dict[str, Tuple[tuple, List[dict]]] = {}  # name -> (version, docs)
+        self._locks: Dict[str, asyncio.Lock] = {name: asyncio.Lock() for name in CONFIG_COLLECTIONS}
+
+    def version(self, name: str) -> tuple:
+        return self.versions.version(name)
+
+    async def get(self, name: str) -> List[dict]:
+        """All documents of a config collection, without `_id`.
+
+        The returned list is shared; callers must not modify it.
+        """
+        entry = self._documents.get(name)
+        if entry is not None and entry[0] == self.version(name):
+            return entry[1]
+
+        async with self._locks[name]:
+            entry = self._documents.get(name)
+            version = self.version(name)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+            documents = await self.db[name].find({}, {"_id": 0}).to_list(None)
+            self._documents[name] = (version, documents)
+            return documents
+
+    def invalidate(self, name: str):
+        """Drop a collection's copy after a write"""
+        self.versions.bump(name)
+        self._documents.pop(name, None)
+
+
+# Global instance
+config_cache: Optional[ConfigCache] = None
+
+def get_config_cache(db: AsyncIOMotorDatabase) -> ConfigCache:
+    global config_cache
+    if config_cache is None:
+        config_cache = ConfigCache(db)
+    return config_cache
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+import bson
+from bson import Binary
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING
+
+logger = logging.getLogger(__name__)
+
+
+def compress_messages(messages: List[dict]) -> bytes:
+    import zstandard
+    return zstandard.ZstdCompressor(level=9).compress(bson.encode({"messages": messages}))
+
+
+def decompress_messages(data: bytes) -> List[dict]:
+    import zstandard
+    return bson.decode(zstandard.ZstdDecompressor().decompress(data))["messages"]
+
+
+class MessageArchiver:
+    """Moves old messages from the hot `messages` collection to the cold tier.
+
+    Messages older than `archive_after_days` are packed per chat into
+    zstd-compressed chunks of up to `chunk_size` messages and stored in
+    `message_archive`. Each chunk is keyed by (chat_id, first_id), so a
+    pass interrupted between writing a chunk and deleting its messages
+    simply rewrites the same chunk on the next run.
+
+    Archiving is off unless MESSAGE_ARCHIVE_AFTER_DAYS is set. Chat history,
+    exports and stats include archived messages, but message search only
+    covers the hot collection.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.archive_after_days = int(os.environ.get("MESSAGE_ARCHIVE_AFTER_DAYS", "0"))
+        self.chunk_size = int(os.environ.get("MESSAGE_ARCHIVE_CHUNK_SIZE", "500"))
+        self.interval_seconds = int(os.environ.get("MESSAGE_ARCHIVE_INTERVAL_SECONDS", "3600"))
+        self._task: Optional[asyncio.Task] = None
+
+    async def ensure_indexes(self):
+        await self.db.messages.create_index([("chat_id", ASCENDING), ("created_at", DESCENDING)])
+        if self.archive_after_days > 0:
+            # Only the archiving pass looks up messages by age alone
+            await self.db.messages.create_index([("created_at", ASCENDING)])
+        await self.db.message_archive.create_index(
+            [("chat_id", ASCENDING), ("first_id", ASCENDING)], unique=True
+        )
+        await self.db.message_archive.create_index(
+            [("chat_id", ASCENDING), ("last_time", DESCENDING)]
+        )
+
+    def start(self):
+        """Start periodic archiving in background"""
+        if self.archive_after_days > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                archived = await self.archive_old_messages()
+                if archived:
+                    logger.info(f"Archived {archived} old messages")
+            except Exception as e:
+                logger.error(f"Message archiving failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def archive_old_messages(self) -> int:
+        """Archive all messages older than the configured age"""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.archive_after_days)
+        # A cursor rather than distinct(), whose result is capped at 16 MB
+        cursor = self.db.messages.aggregate([
+            {"$match": {"created_at": {"$lt": cutoff}}},
+            {"$group": {"_id": "$chat_id"}}
+        ], allowDiskUse=True)
+        total = 0
+        async for group in cursor:
+            total += await self.archive_chat(group["_id"], cutoff)
+        return total
+
+    async def archive_chat(self, chat_id: str, cutoff: datetime) -> int:
+        """Archive one chat's messages older than cutoff, oldest first"""
+        total = 0
+        while True:
+            messages = await self.db.messages.find(
+                {"chat_id": chat_id, "created_at": {"$lt": cutoff}}
+            ).sort([("created_at", ASCENDING), ("_id", ASCENDING)]).limit(self.chunk_size).to_list(self.chunk_size)
+            if not messages:
+                return total
+
+            object_ids = [msg.pop("_id") for msg in messages]
+            await self.db.message_archive.update_one(
+                {"chat_id": chat_id, "first_id": object_ids[0]},
+                {"$set": {
+                    "bot_id": messages[0].get("bot_id"),
+                    "first_time": messages[0]["created_at"],
+                    "last_time": messages[-1]["created_at"],
+                    "count": len(messages),
+                    "data": Binary(compress_messages(messages))
+                }},
+                upsert=True
+            )
+            await self.db.messages.delete_many({"_id": {"$in": object_ids}})
+            total += len(messages)
+
+            if len(messages) < self.chunk_size:
+                return total
+
+    async def get_archived_messages(
+        self, chat_id: str, before: Optional[datetime], limit: int
+    ) -> List[dict]:
+        """Get up to `limit` newest archived messages older than `before` (newest first)"""
+        if before and before.tzinfo:
+            # Decoded archive documents carry naive UTC datetimes
+            before = before.astimezone(timezone.utc).replace(tzinfo=None)
+
+        query = {"chat_id": chat_id}
+        if before:
+            query["first_time"] = {"$lt": before}
+
+        result = []
+        cursor = self.db.message_archive.find(query, {"_id": 0, "data": 1}).sort("last_time", DESCENDING)
+        async for chunk in cursor:
+            messages = decompress_messages(chunk["data"])
+            for msg in reversed(messages):
+                if before and msg["created_at"] >= before:
+                    continue
+                result.append(msg)
+                if len(result) >= limit:
+                    return result
+        return result
+
+
+# Global instance
+message_archiver: Optional[MessageArchiver] = None
+
+def get_message_archiver(db: AsyncIOMotorDatabase) -> MessageArchiver:
+    global message_archiver
+    if message_archiver is None:
+        message_archiver = MessageArchiver(db)
+    return message_archiver
@@ -0,0 +1,421 @@
+import asyncio
+import base64
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, ReadPreference
+
+from message_archive import decompress_messages
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("jsonl", "msgpack", "parquet")
+EXTENSIONS = {"jsonl": "jsonl.zst", "msgpack": "msgpack.zst", "parquet": "parquet"}
+
+# Fields written for every exported message (same order in every format)
+EXPORT_FIELDS = [
+    "id", "chat_id", "bot_id", "user_id", "text", "file_id", "file_type",
+    "telegram_message_id", "is_from_bot", "created_at"
+]
+
+
+def encode_resume_token(created_at: datetime, object_id: ObjectId) -> str:
+    """Encode position (created_at, _id) of the last exported message"""
+    payload = json.dumps({"t": created_at.isoformat(), "o": str(object_id)})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def encode_archive_resume_token(chunk_id: ObjectId) -> str:
+    """Encode position _id of the last exported archive chunk"""
+    payload = json.dumps({"a": str(chunk_id)})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_resume_token(token: str) -> dict:
+    """Decode resume token into {"chunk_id"} in the archive or {"created_at", "_id"} after it"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        if "a" in payload:
+            return {"chunk_id": ObjectId(payload["a"])}
+        return {"created_at": datetime.fromisoformat(payload["t"]), "_id": ObjectId(payload["o"])}
+    except Exception:
+        raise ValueError("Invalid resume token")
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class _JsonlWriter:
+    """Writes rows as zstd-compressed JSON lines"""
+
+    def __init__(self, path: Path, level: int):
+        import zstandard
+        self._file = open(path, "wb")
+        self._writer = zstandard.ZstdCompressor(level=level).stream_writer(self._file)
+
+    def write_rows(self, rows: List[dict]):
+        lines = []
+        for row in rows:
+            row = dict(row)
+            if isinstance(row.get("created_at"), datetime):
+                row["created_at"] = _as_utc(row["created_at"]).isoformat()
+            lines.append(json.dumps(row, ensure_ascii=False))
+        self._writer.write(("\n".join(lines) + "\n").encode("utf-8"))
+
+    def close(self):
+        self._writer.close()
+
+
+class _MsgpackWriter:
+    """Writes rows as a zstd-compressed stream of MessagePack maps"""
+
+    def __init__(self, path: Path, level: int):
+        import msgpack
+        import zstandard
+        self._packer = msgpack.Packer()
+        self._file = open(path, "wb")
+        self._writer = zstandard.ZstdCompressor(level=level).stream_writer(self._file)
+
+    def write_rows(self, rows: List[dict]):
+        chunks = []
+        for row in rows:
+            row = dict(row)
+            if isinstance(row.get("created_at"), datetime):
+                row["created_at"] = _as_utc(row["created_at"]).isoformat()
+            chunks.append(self._packer.pack(row))
+        self._writer.write(b"".join(chunks))
+
+    def close(self):
+        self._writer.close()
+
+
+class _ParquetWriter:
+    """Writes rows as zstd-compressed Parquet row groups"""
+
+    def __init__(self, path: Path, level: int):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export requires pyarrow")
+        self._pa = pa
+        self._schema = pa.schema([
+            ("id", pa.string()),
+            ("chat_id", pa.string()),
+            ("bot_id", pa.string()),
+            ("user_id", pa.int64()),
+            ("text", pa.string()),
+            ("file_id", pa.string()),
+            ("file_type", pa.string()),
+            ("telegram_message_id", pa.int64()),
+            ("is_from_bot", pa.bool_()),
+            ("created_at", pa.timestamp("us", tz="UTC")),
+        ])
+        self._writer = pq.ParquetWriter(
+            str(path), self._schema, compression="zstd", compression_level=level
+        )
+
+    def write_rows(self, rows: List[dict]):
+        columns = {name: [row.get(name) for row in rows] for name in EXPORT_FIELDS}
+        columns["created_at"] = [_as_utc(value) for value in columns["created_at"]]
+        self._writer.write_table(self._pa.table(columns, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+class MessageExporter:
+    """Streams message history out of Mongo into compressed archive files.
+
+    Archived messages come first, one `message_archive` chunk at a time,
+    followed by the hot messages in `_id`-stable order (created_at, _id) in
+    batches, so memory stays bounded by one batch or chunk. Output is split
+    into part files of about `rows_per_file` rows (archive parts end on a
+    chunk boundary); the resume token is checkpointed every time a part is
+    closed, so an interrupted job continues from the last complete part.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase, export_dir: Path):
+        self.db = db
+        self.export_dir = Path(export_dir)
+        self.batch_size = int(os.environ.get("EXPORT_BATCH_SIZE", "2000"))
+        self.rows_per_file = int(os.environ.get("EXPORT_ROWS_PER_FILE", "1000000"))
+        self.compression_level = int(os.environ.get("EXPORT_ZSTD_LEVEL", "3"))
+        # Upper bound on exported docs per second, 0 = unthrottled
+        self.max_docs_per_second = int(os.environ.get("EXPORT_MAX_DOCS_PER_SECOND", "0"))
+        self.tasks: Dict[str, asyncio.Task] = {}
+
+    async def ensure_indexes(self):
+        """Index used to stream one bot's messages by time.
+
+        Archive chunks are read through the (bot_id, _id) index that bot
+        deletion builds.
+        """
+        await self.db.messages.create_index(
+            [("bot_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]
+        )
+
+    async def start_export(
+        self,
+        bot_id: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        export_format: str = "jsonl",
+        resume_token: Optional[str] = None
+    ) -> dict:
+        """Create an export job and run it in background"""
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {export_format}")
+        if resume_token:
+            decode_resume_token(resume_token)
+
+        job = {
+            "id": str(uuid.uuid4()),
+            "bot_id": bot_id,
+            "since": _as_utc(since),
+            "until": _as_utc(until),
+            "format": export_format,
+            "status": "pending",
+            "resume_token": resume_token,
+            "files": [],
+            "exported_count": 0,
+            "bytes_written": 0,
+            "docs_per_second": 0.0,
+            "error": None,
+            "created_at": datetime.now(timezone.utc),
+            "updated_at": datetime.now(timezone.utc)
+        }
+        await self.db.export_jobs.insert_one(job)
+        job.pop("_id", None)
+        self._spawn(job)
+        return job
+
+    async def get_job(self, job_id: str) -> Optional[dict]:
+        return await self.db.export_jobs.find_one({"id": job_id}, {"_id": 0})
+
+    async def resume_pending(self):
+        """Restart jobs interrupted by a shutdown from their last checkpoint"""
+        jobs = await self.db.export_jobs.find(
+            {"status": {"$in": ["pending", "running"]}}, {"_id": 0}
+        ).to_list(None)
+        for job in jobs:
+            logger.info(f"Resuming export job {job['id']}")
+            self._spawn(job)
+
+    async def stop(self):
+        """Interrupt running jobs; they resume from their checkpoint on next startup"""
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _spawn(self, job: dict):
+        task = asyncio.create_task(self._run(job))
+        self.tasks[job["id"]] = task
+        task.add_done_callback(lambda _: self.tasks.pop(job["id"], None))
+
+    def _build_query(self, job: dict) -> dict:
+        query = {"bot_id": job["bot_id"]}
+        created_at = {}
+        if job.get("since"):
+            created_at["$gte"] = job["since"]
+        if job.get("until"):
+            created_at["$lt"] = job["until"]
+        if created_at:
+            query["created_at"] = created_at
+
+        position = decode_resume_token(job["resume_token"]) if job.get("resume_token") else {}
+        if "created_at" in position:
+            last_time, last_id = position["created_at"], position["_id"]
+            query = {"$and": [query, {"$or": [
+                {"created_at": {"$gt": last_time}},
+                {"created_at": last_time, "_id": {"$gt": last_id}}
+            ]}]}
+        return query
+
+    def _build_archive_query(self, job: dict) -> dict:
+        query = {"bot_id": job["bot_id"]}
+        if job.get("since"):
+            query["last_time"] = {"$gte": job["since"]}
+        if job.get("until"):
+            query["first_time"] = {"$lt": job["until"]}
+
+        position = decode_resume_token(job["resume_token"]) if job.get("resume_token") else {}
+        if "chunk_id" in position:
+            query["_id"] = {"$gt": position["chunk_id"]}
+        return query
+
+    @staticmethod
+    def _in_range(job: dict, doc: dict) -> bool:
+        created_at = _as_utc(doc["created_at"])
+        return (
+            (not job.get("since") or created_at >= _as_utc(job["since"]))
+            and (not job.get("until") or created_at < _as_utc(job["until"]))
+        )
+
+    def _open_part(self, job: dict, part_number: int):
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+        path = self.export_dir / f"{job['id']}_{part_number:05d}.{EXTENSIONS[job['format']]}"
+        writer_class = {
+            "jsonl": _JsonlWriter, "msgpack": _MsgpackWriter, "parquet": _ParquetWriter
+        }[job["format"]]
+        return path, writer_class(path, self.compression_level)
+
+    async def _run(self, job: dict):
+        job_id = job["id"]
+        files = list(job.get("files", []))
+        exported_count = sum(f["rows"] for f in files)
+        bytes_written = sum(f["bytes"] for f in files)
+
+        # A part that was open when the job was interrupted is incomplete
+        for stale in self.export_dir.glob(f"{job_id}_*"):
+            if stale.name not in [f["name"] for f in files]:
+                stale.unlink()
+
+        await self.db.export_jobs.update_one(
+            {"id": job_id},
+            {"$set": {"status": "running", "updated_at": datetime.now(timezone.utc)}}
+        )
+
+        # Read from a secondary when available to keep load off the primary
+        messages = self.db.messages.with_options(
+            read_preference=ReadPreference.SECONDARY_PREFERRED
+        )
+        archive = self.db.message_archive.with_options(
+            read_preference=ReadPreference.SECONDARY_PREFERRED
+        )
+        position = decode_resume_token(job["resume_token"]) if job.get("resume_token") else {}
+
+        started = time.monotonic()
+        run_count = 0
+        part_path, writer, part_rows = None, None, 0
+        last_doc, last_chunk_id = None, None
+        batch = []
+
+        async def flush_batch():
+            nonlocal part_path, writer, part_rows, run_count, exported_count
+            if writer is None:
+                part_path, writer = await asyncio.to_thread(self._open_part, job, len(files) + 1)
+                part_rows = 0
+            rows = [{name: doc.get(name) for name in EXPORT_FIELDS} for doc in batch]
+            await asyncio.to_thread(writer.write_rows, rows)
+            part_rows += len(rows)
+            run_count += len(rows)
+            exported_count += len(rows)
+            batch.clear()
+
+            elapsed = time.monotonic() - started
+            await self.db.export_jobs.update_one(
+                {"id": job_id},
+                {"$set": {
+                    "exported_count": exported_count,
+                    "docs_per_second": round(run_count / elapsed, 1) if elapsed else 0.0,
+                    "updated_at": datetime.now(timezone.utc)
+                }}
+            )
+            if self.max_docs_per_second and elapsed < run_count / self.max_docs_per_second:
+                await asyncio.sleep(run_count / self.max_docs_per_second - elapsed)
+
+        async def close_part():
+            nonlocal writer, bytes_written
+            await asyncio.to_thread(writer.close)
+            size = part_path.stat().st_size
+            bytes_written += size
+            files.append({"name": part_path.name, "rows": part_rows, "bytes": size})
+            writer = None
+            # Checkpoint: everything up to last_doc (or last_chunk_id) is now safely on disk
+            if last_doc is not None:
+                resume_token = encode_resume_token(_as_utc(last_doc["created_at"]), last_doc["_id"])
+            else:
+                resume_token = encode_archive_resume_token(last_chunk_id)
+            await self.db.export_jobs.update_one(
+                {"id": job_id},
+                {"$set": {
+                    "files": files,
+                    "exported_count": exported_count,
+                    "bytes_written": bytes_written,
+                    "resume_token": resume_token,
+                    "updated_at": datetime.now(timezone.utc)
+                }}
+            )
+
+        try:
+            if "created_at" not in position:
+                chunks = archive.find(self._build_archive_query(job)).sort("_id", ASCENDING)
+                async for chunk in chunks:
+                    for doc in await asyncio.to_thread(decompress_messages, chunk["data"]):
+                        if self._in_range(job, doc):
+                            batch.append(doc)
+                        if len(batch) >= self.batch_size:
+                            await flush_batch()
+                    last_chunk_id = chunk["_id"]
+                    # Archive parts only end after a whole chunk
+                    if (part_rows if writer else 0) + len(batch) >= self.rows_per_file:
+                        if batch:
+                            await flush_batch()
+                        await close_part()
+
+            cursor = messages.find(self._build_query(job)).sort(
+                [("created_at", ASCENDING), ("_id", ASCENDING)]
+            ).batch_size(self.batch_size)
+            async for doc in cursor:
+                batch.append(doc)
+                last_doc = doc
+                if len(batch) >= self.batch_size:
+                    await flush_batch()
+                    if part_rows >= self.rows_per_file:
+                        await close_part()
+            if batch:
+                await flush_batch()
+            if writer is not None:
+                await close_part()
+
+            await self.db.export_jobs.update_one(
+                {"id": job_id},
+                {"$set": {"status": "completed", "updated_at": datetime.now(timezone.utc)}}
+            )
+            logger.info(f"Export job {job_id} completed: {exported_count} messages")
+        except asyncio.CancelledError:
+            # Leave status as running so the job resumes on next startup
+            if writer is not None:
+                writer.close()
+            raise
+        except Exception as e:
+            logger.error(f"Export job {job_id} failed: {e}")
+            if writer is not None:
+                writer.close()
+            await self.db.export_jobs.update_one(
+                {"id": job_id},
+                {"$set": {
+                    "status": "failed",
+                    "error": str(e),
+                    "updated_at": datetime.now(timezone.utc)
+                }}
+            )
+
+    def file_path(self, job: dict, file_name: str) -> Optional[Path]:
+        """Resolve a finished part file of a job"""
+        if file_name not in [f["name"] for f in job.get("files", [])]:
+            return None
+        return self.export_dir / file_name
+
+
+# Global instance
+message_exporter: Optional[MessageExporter] = None
+
+def get_message_exporter(db: AsyncIOMotorDatabase, export_dir: Path) -> MessageExporter:
+    global message_exporter
+    if message_exporter is None:
+        message_exporter = MessageExporter(db, export_dir)
+    return message_exporter
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime, timezone
 import uuid
 
@@ -21,6 +21,16 @@ class BotResponse(BaseModel):
     is_active: bool
     created_at: datetime
 
+class BotStateResponse(BaseModel):
+    bot_id: str
+    state: str  # pending, starting, running, hibernating, failed, stopped, quarantined
+    error: Optional[str] = None
+    retry_at: Optional[datetime] = None
+    updated_at: datetime
+
+class BotImportRequest(BaseModel):
+    tokens: List[str]
+
 class Chat(BaseModel):
     id: str
     bot_id: str
@@ -35,6 +45,7 @@ class Chat(BaseModel):
     sale_amount: Optional[float] = None
     sale_date: Optional[datetime] = None
     bot_status: str = "active"  # active or blocked
+    last_read_message_time: Optional[datetime] = None  # read watermark
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -48,7 +59,7 @@ class Message(BaseModel):
     file_type: Optional[str] = None
     telegram_message_id: Optional[int] = None
     is_from_bot: bool
-    is_read: bool = False
+    is_read: bool = False  # derived from chat read watermark
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class MessageCreate(BaseModel):
@@ -64,9 +75,25 @@ class BroadcastMessage(BaseModel):
     text: str
     file_id: Optional[str] = None
 
+class SearchMessageHit(BaseModel):
+    message: Message
+    chat: Optional[Chat] = None
+    score: float
+
+class SearchResponse(BaseModel):
+    chats: List[Chat]
+    messages: List[SearchMessageHit]
+
 class MarkReadRequest(BaseModel):
     chat_id: str
 
+class ChatFilter(BaseModel):
+    bot_ids: Optional[List[str]] = None
+    search: Optional[str] = None
+    unread_only: Optional[bool] = None
+    label_id: Optional[str] = None
+    bot_status: Optional[str] = None
+
 # ============= NEW MODELS =============
 
 class Label(BaseModel):
@@ -124,6 +151,11 @@ class SetLabelsRequest(BaseModel):
     chat_ids: List[str]
     label_ids: List[str]
 
+class ApplyLabelRequest(BaseModel):
+    label_id: str
+    filter: ChatFilter  # label every chat matching this filter
+    remove: bool = False  # remove the label instead of adding it
+
 class WelcomeMessage(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     bot_id: str
@@ -243,6 +275,67 @@ class TimerResponse(BaseModel):
     created_at: datetime
 
 
+# ============= EXPORT MODELS =============
+
+class MessageExportCreate(BaseModel):
+    bot_id: str
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    format: str = "jsonl"  # "jsonl" (zstd), "msgpack" (zstd) or "parquet"
+    resume_token: Optional[str] = None  # continue after a previous export
+
+class MessageExportResponse(BaseModel):
+    id: str
+    bot_id: str
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    format: str
+    status: str  # pending, running, completed, failed
+    resume_token: Optional[str] = None
+    files: List[dict] = []  # [{"name": str, "rows": int, "bytes": int}]
+    exported_count: int = 0
+    bytes_written: int = 0
+    docs_per_second: float = 0.0
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+# ============= BOT DELETION MODELS =============
+
+class BotDeletionJobResponse(BaseModel):
+    id: str
+    bot_id: str
+    status: str  # pending, running, completed, failed
+    collection: str  # collection currently being deleted
+    deleted: dict  # {collection: deleted_count}
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+# ============= BATCH MODELS =============
+
+class BatchOperation(BaseModel):
+    id: Optional[str] = None  # defaults to the position in the batch
+    method: str = "GET"
+    path: str  # relative to /api, e.g. "/chats/{chat_id}/read"
+    params: Optional[Dict[str, Any]] = None
+    body: Optional[Any] = None
+    depends_on: List[str] = []  # ids of earlier operations to wait for
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+
+class BatchOperationResult(BaseModel):
+    id: str
+    status: int
+    body: Optional[Any] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchOperationResult]
+
+
 # ============= USER MODELS =============
 
 class User(BaseModel):
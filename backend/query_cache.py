@@ -0,0 +1,72 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCache:
+    """Short-lived shared cache of query results with single-flight loading.
+
+    Keys include the version of the data they were read from (see
+    versions.ResourceVersions), so a write to an affected bot makes the
+    next lookup miss without explicit invalidation. Concurrent lookups of
+    the same key share one in-flight load, which runs as its own task so it
+    completes even if the caller that started it is cancelled.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] >= time.monotonic():
+                self._entries.move_to_end(key)
+                return entry[1]
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(loader())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        # Shielded: a caller that is cancelled doesn't cancel the load the others wait for
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # exception() also marks an error as retrieved when nobody waits anymore
+        if not task.cancelled() and task.exception() is None:
+            self._put(key, task.result())
+
+    def _put(self, key: Hashable, value: Any):
+        if self.ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+# Global instance
+chat_list_cache: Optional[QueryCache] = None
+
+def get_chat_list_cache() -> QueryCache:
+    global chat_list_cache
+    if chat_list_cache is None:
+        chat_list_cache = QueryCache(
+            ttl=float(os.environ.get("CHAT_LIST_CACHE_TTL_SECONDS", "5")),
+            max_size=int(os.environ.get("CHAT_LIST_CACHE_SIZE", "256"))
+        )
+    return chat_list_cache
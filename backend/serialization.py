@@ -0,0 +1,86 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Type
+
+import msgpack
+from fastapi import Request
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel
+
+# Defaults of model fields that older documents may lack. Timestamps are
+# left out on purpose: stored documents always have them.
+CHAT_DEFAULTS = {
+    "unread_count": 0,
+    "label_ids": [],
+    "sale_amount": None,
+    "sale_date": None,
+    "bot_status": "active",
+    "last_read_message_time": None
+}
+
+MESSAGE_DEFAULTS = {
+    "file_id": None,
+    "file_type": None,
+    "telegram_message_id": None,
+    "is_read": False
+}
+
+
+def select_fields(model: Type[BaseModel], fields: Optional[str]) -> List[str]:
+    """Model fields named in a comma separated `fields` parameter, all if not given.
+
+    Unknown names are ignored and `id` is always included.
+    """
+    known = list(model.model_fields.keys())
+    if not fields:
+        return known
+    requested = {name.strip() for name in fields.split(",")}
+    return [name for name in known if name in requested or name == "id"]
+
+
+def projection(field_names: Iterable[str]) -> Dict[str, int]:
+    """Mongo projection returning only the given fields"""
+    result = {"_id": 0}
+    result.update({name: 1 for name in field_names})
+    return result
+
+
+def lean_documents(documents: List[dict], field_names: List[str], defaults: dict) -> List[dict]:
+    """Keep only the selected fields of raw documents, filling missing defaults"""
+    return [
+        {
+            name: doc[name] if name in doc else defaults[name]
+            for name in field_names
+            if name in doc or name in defaults
+        }
+        for doc in documents
+    ]
+
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+
+def _msgpack_default(value):
+    # Same datetime representation as the JSON responses
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+class MsgpackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, default=_msgpack_default)
+
+
+def wants_msgpack(request: Request) -> bool:
+    """Whether the client opted into MessagePack with its Accept header"""
+    return MSGPACK_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def documents_response(request: Request, content: Any, headers: Optional[dict] = None) -> Response:
+    """Raw documents as MessagePack if requested, orjson otherwise"""
+    headers = {**(headers or {}), "Vary": "Accept"}
+    if wants_msgpack(request):
+        return MsgpackResponse(content, headers=headers)
+    return ORJSONResponse(content, headers=headers)
@@ -1,33 +1,58 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Form
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Form, Header, Depends, Request, Response
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import socketio
+import asyncio
 import os
 import logging
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Set
 from datetime import datetime, timezone
 import aiofiles
+import orjson
+import re
 import uuid
 
 from models import (
-    BotCreate, BotResponse, Chat, Message, MessageCreate, 
-    BroadcastMessage, MarkReadRequest,
+    BotCreate, BotResponse, BotStateResponse, BotImportRequest, Chat, Message, MessageCreate, 
+    BroadcastMessage, MarkReadRequest, ChatFilter, SearchResponse,
     Label, LabelCreate, LabelResponse,
     QuickReply, QuickReplyCreate, QuickReplyResponse,
     AutoReply, AutoReplyCreate, AutoReplyResponse,
-    SetLabelsRequest,
+    SetLabelsRequest, ApplyLabelRequest,
     WelcomeMessage, WelcomeMessageCreate, WelcomeMessageResponse,
     MenuButton, MenuButtonCreate, MenuButtonResponse,
     BotMenu, BotMenuCreate, BotMenuResponse,
     BotMenuAssignment, BotMenuAssignmentResponse,
     SaleCreate, SaleResponse, SalesStatistics, ExportUsernamesRequest,
     Timer, TimerCreate, TimerResponse,
-    User, UserCreate, UserUpdate, UserResponse, LoginRequest
+    User, UserCreate, UserUpdate, UserResponse, LoginRequest,
+    MessageExportCreate, MessageExportResponse, BotDeletionJobResponse,
+    BatchRequest, BatchResponse
 )
 from telegram_manager import get_telegram_manager
+from bot_supervisor import get_bot_supervisor
+from bot_hibernation import get_bot_hibernator
+from message_export import get_message_exporter
+from message_archive import get_message_archiver
+from bot_deletion import get_bot_deletion_manager
+from chat_counts import get_chat_counts, COUNTED_FIELDS
+from chat_search import get_chat_search, query_terms
+from typeahead import get_typeahead_index
+from auth import get_access_control, scope_bot_ids
+from versions import get_resource_versions, etag_matches
+from serialization import (
+    CHAT_DEFAULTS, MESSAGE_DEFAULTS, select_fields, projection, lean_documents,
+    documents_response, wants_msgpack
+)
+from compression import CompressionMiddleware
+from query_cache import get_chat_list_cache
+from config_cache import get_config_cache
+from batch_loader import RequestLoaders
+from batch import BatchExecutor
+from pymongo import ReturnDocument, UpdateOne
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -40,6 +65,44 @@ db = client[os.environ['DB_NAME']]
 # Telegram manager
 telegram_manager = get_telegram_manager(db)
 
+# Restarts of failed bots
+bot_supervisor = get_bot_supervisor(db, telegram_manager)
+
+# Parking of idle bots
+bot_hibernator = get_bot_hibernator(telegram_manager)
+
+# Message history export
+message_exporter = get_message_exporter(
+    db, Path(os.environ.get('EXPORT_DIR', ROOT_DIR / 'exports'))
+)
+
+# Hot/cold message tiering
+message_archiver = get_message_archiver(db)
+
+# Background deletion of removed bots' data
+bot_deletion_manager = get_bot_deletion_manager(db)
+
+# Sidebar chat counts
+chat_counts = get_chat_counts(db)
+
+# Chat name and message text search
+chat_search = get_chat_search(db)
+
+# Username/name prefix suggestions
+typeahead_index = get_typeahead_index(db)
+
+# Per-operator access to bots
+access_control = get_access_control(db)
+
+# Change counters for conditional GETs
+resource_versions = get_resource_versions()
+
+# Shared chat list results
+chat_list_cache = get_chat_list_cache()
+
+# Read-mostly config collections
+config_cache = get_config_cache(db)
+
 # Create Socket.IO server
 sio = socketio.AsyncServer(
     async_mode='asgi',
@@ -56,6 +119,8 @@ socket_app = socketio.ASGIApp(sio, app)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
+# Routes reachable without an access token (login, health check)
+public_router = APIRouter(prefix="/api")
 
 # Configure logging
 logging.basicConfig(
@@ -86,6 +151,64 @@ async def broadcast_chat_status(chat_id: str, bot_status: str):
     logger.info(f"Broadcasted status update: chat_id={chat_id}, status={bot_status}")
 
 
+# ============= ACCESS SCOPE =============
+
+def get_access_token(authorization: Optional[str] = Header(None)) -> Optional[str]:
+    """Access token from `Authorization: Bearer <token>` header"""
+    if authorization and authorization.lower().startswith("bearer "):
+        return authorization[7:].strip()
+    return None
+
+async def require_user(token: Optional[str] = Depends(get_access_token)) -> dict:
+    """Caller's user, 401 if the access token is missing or unknown"""
+    user = await access_control.get_user(token)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return user
+
+async def get_bot_scope(token: Optional[str] = Depends(get_access_token)) -> Optional[List[str]]:
+    """Bot ids the caller is restricted to, None if unrestricted"""
+    return await access_control.get_allowed_bot_ids(token)
+
+def ensure_bot_access(bot_id: str, allowed: Optional[List[str]]):
+    if allowed is not None and bot_id not in allowed:
+        raise HTTPException(status_code=403, detail="No access to this bot")
+
+def split_ids(value: Optional[str]) -> Optional[List[str]]:
+    return value.split(",") if value else None
+
+def get_loaders() -> RequestLoaders:
+    """Batch loaders for one request"""
+    return RequestLoaders(db)
+
+
+# ============= CONDITIONAL GET =============
+
+def resource_etag(request: Request, allowed: Optional[List[str]], *versions) -> str:
+    """ETag of a polled response from resource versions, query and caller scope"""
+    scope = tuple(sorted(allowed)) if allowed is not None else None
+    return resource_versions.etag(
+        request.url.path, str(request.url.query), wants_msgpack(request), scope, versions
+    )
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """304 response if the client already has this version"""
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=etag_headers(etag))
+    return None
+
+def etag_headers(etag: str) -> dict:
+    # no-cache: browsers keep the body but revalidate on every poll
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+def config_not_modified(request: Request, response: Response, name: str, allowed: Optional[List[str]] = None) -> Optional[Response]:
+    """304 response if the client has the current version of a config collection, else tag response"""
+    etag = resource_etag(request, allowed, config_cache.version(name))
+    cached = not_modified(request, etag)
+    if not cached:
+        response.headers.update(etag_headers(etag))
+    return cached
+
 # ============= BOT ENDPOINTS =============
 
 @api_router.post("/bots", response_model=BotResponse)
@@ -99,12 +222,14 @@ async def add_bot(bot_data: BotCreate):
         bot_doc = {
             "id": bot_id,
             "token": bot_data.token,
+            "telegram_id": bot_info["telegram_id"],
             "username": bot_info["username"],
             "first_name": bot_info["first_name"],
             "is_active": True,
             "created_at": datetime.now(timezone.utc)
         }
         await db.bots.insert_one(bot_doc)
+        config_cache.invalidate("bots")
         
         return BotResponse(
             id=bot_id,
@@ -115,27 +240,137 @@ async def add_bot(bot_data: BotCreate):
         )
     except Exception as e:
         logger.error(f"Failed to add bot: {e}")
+        telegram_manager.states.pop(bot_id, None)
         raise HTTPException(status_code=400, detail=str(e))
 
+BOT_TOKEN_PATTERN = re.compile(r"^\d+:[A-Za-z0-9_-]{30,}$")
+BOT_IMPORT_MAX_TOKENS = int(os.environ.get('BOT_IMPORT_MAX_TOKENS', '500'))
+BOT_IMPORT_CONCURRENCY = int(os.environ.get('BOT_IMPORT_CONCURRENCY', '10'))
+# Running imports; the event loop only keeps weak references to tasks
+bot_import_tasks: Set[asyncio.Task] = set()
+
+async def run_bot_import(tokens: List[str], results: asyncio.Queue):
+    """Start bots for many tokens concurrently and save the ones that started.
+
+    Puts one result per token on the queue as it finishes, then a summary
+    and None. A bot is reported "added" only once it is saved; one that
+    can't be saved is stopped again. Runs as its own task so a client that
+    disconnects mid-stream doesn't leave started bots unsaved.
+    """
+    existing = {bot["token"] for bot in await config_cache.get("bots")}
+    semaphore = asyncio.Semaphore(BOT_IMPORT_CONCURRENCY)
+    seen = set()
+    added = 0
+
+    async def import_token(index: int, token: str) -> dict:
+        nonlocal added
+        if not BOT_TOKEN_PATTERN.match(token):
+            return {"index": index, "status": "invalid", "error": "Malformed token"}
+        if token in existing or token in seen:
+            return {"index": index, "status": "duplicate", "error": "Bot already added"}
+        seen.add(token)
+        bot_id = str(uuid.uuid4())
+        async with semaphore:
+            try:
+                bot_info = await telegram_manager.add_bot(bot_id, token)
+            except Exception as e:
+                telegram_manager.states.pop(bot_id, None)
+                return {"index": index, "status": "failed", "error": str(e)}
+            try:
+                await db.bots.insert_one({
+                    "id": bot_id,
+                    "token": token,
+                    "telegram_id": bot_info["telegram_id"],
+                    "username": bot_info["username"],
+                    "first_name": bot_info["first_name"],
+                    "is_active": True,
+                    "created_at": datetime.now(timezone.utc)
+                })
+            except Exception as e:
+                await telegram_manager.remove_bot(bot_id)
+                telegram_manager.states.pop(bot_id, None)
+                return {"index": index, "status": "failed", "error": f"Failed to save bot: {e}"}
+        added += 1
+        return {
+            "index": index,
+            "status": "added",
+            "bot": {"id": bot_id, "username": bot_info["username"], "first_name": bot_info["first_name"]}
+        }
+
+    try:
+        tasks = [import_token(index, token.strip()) for index, token in enumerate(tokens)]
+        for next_result in asyncio.as_completed(tasks):
+            await results.put(await next_result)
+        await results.put({"done": True, "added": added, "total": len(tokens)})
+    except Exception as e:
+        logger.error(f"Bot import failed: {e}")
+        await results.put({"done": True, "error": str(e)})
+    finally:
+        if added:
+            config_cache.invalidate("bots")
+        await results.put(None)
+
+@api_router.post("/bots/import")
+async def import_bots(import_data: BotImportRequest):
+    """Add many bots at once.
+
+    Streams NDJSON: one line per token in completion order ("index" is its
+    position in the request), then a summary line with "done": true.
+    """
+    if len(import_data.tokens) > BOT_IMPORT_MAX_TOKENS:
+        raise HTTPException(status_code=400, detail=f"At most {BOT_IMPORT_MAX_TOKENS} tokens per import")
+    results: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(run_bot_import(import_data.tokens, results))
+    bot_import_tasks.add(task)
+    task.add_done_callback(bot_import_tasks.discard)
+
+    async def lines():
+        while (result := await results.get()) is not None:
+            yield orjson.dumps(result) + b"\n"
+
+    # Proxies must pass lines through as they come
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
 @api_router.get("/bots", response_model=List[BotResponse])
-async def get_bots():
-    """Get all bots"""
-    bots = await db.bots.find({}, {"_id": 0}).to_list(100)
-    return [BotResponse(**bot) for bot in bots]
+async def get_bots(request: Request, response: Response, allowed: Optional[List[str]] = Depends(get_bot_scope)):
+    """Get all bots visible to the caller"""
+    cached = config_not_modified(request, response, "bots", allowed)
+    if cached:
+        return cached
+    bots = await config_cache.get("bots")
+    return [BotResponse(**bot) for bot in bots if allowed is None or bot["id"] in allowed]
+
+@api_router.get("/bots/states", response_model=List[BotStateResponse])
+async def get_bot_states(allowed: Optional[List[str]] = Depends(get_bot_scope)):
+    """Startup state of each bot known to the manager"""
+    return [
+        BotStateResponse(bot_id=bot_id, **state)
+        for bot_id, state in telegram_manager.states.items()
+        if allowed is None or bot_id in allowed
+    ]
 
 @api_router.delete("/bots/{bot_id}")
 async def delete_bot(bot_id: str):
-    """Delete a bot"""
+    """Delete a bot; its chats, messages and settings are removed in background"""
     try:
         await telegram_manager.remove_bot(bot_id)
+        telegram_manager.states.pop(bot_id, None)
         await db.bots.delete_one({"id": bot_id})
-        await db.chats.delete_many({"bot_id": bot_id})
-        await db.messages.delete_many({"bot_id": bot_id})
-        return {"success": True, "message": "Bot deleted successfully"}
+        config_cache.invalidate("bots")
+        job = await bot_deletion_manager.start_deletion(bot_id)
+        return {"success": True, "message": "Bot deleted successfully", "job_id": job["id"]}
     except Exception as e:
         logger.error(f"Failed to delete bot: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
+@api_router.get("/bots/{bot_id}/deletion", response_model=BotDeletionJobResponse)
+async def get_bot_deletion(bot_id: str):
+    """Get progress of bot data deletion"""
+    job = await bot_deletion_manager.get_job(bot_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Deletion job not found")
+    return BotDeletionJobResponse(**job)
+
 @api_router.patch("/bots/{bot_id}/toggle")
 async def toggle_bot(bot_id: str):
     """Toggle bot active status"""
@@ -144,81 +379,211 @@ async def toggle_bot(bot_id: str):
         raise HTTPException(status_code=404, detail="Bot not found")
     
     new_status = not bot.get("is_active", True)
-    await db.bots.update_one(
-        {"id": bot_id},
-        {"$set": {"is_active": new_status}}
-    )
-    return {"success": True, "is_active": new_status}
+    if new_status:
+        # Turning a bot on also lifts its quarantine
+        await db.bots.update_one(
+            {"id": bot_id},
+            {"$set": {"is_active": True}, "$unset": {"quarantined_at": "", "quarantine_reason": ""}}
+        )
+    else:
+        await db.bots.update_one({"id": bot_id}, {"$set": {"is_active": False}})
+    config_cache.invalidate("bots")
+    
+    bot_supervisor.reset(bot_id)
+    if new_status:
+        if bot_id in telegram_manager.applications:
+            return {"success": True, "is_active": True, "state": "running"}
+        try:
+            await telegram_manager.start_stored_bot(bot)
+        except Exception as e:
+            # Left to the supervisor unless the token was quarantined
+            logger.error(f"Failed to start bot {bot_id}: {e}")
+    else:
+        await telegram_manager.remove_bot(bot_id)
+    return {"success": True, "is_active": new_status, "state": telegram_manager.get_state(bot_id)["state"]}
 
 # ============= CHAT ENDPOINTS =============
 
-@api_router.get("/chats", response_model=List[Chat])
-async def get_chats(
-    bot_ids: Optional[str] = None, 
-    search: Optional[str] = None,
-    unread_only: Optional[bool] = None,
-    label_id: Optional[str] = None,
-    bot_status: Optional[str] = None
-):
-    """Get all chats with optional filtering"""
+def build_chat_query(chat_filter: ChatFilter) -> dict:
+    """Build Mongo query for chats matching filter"""
     query = {}
     
     # Filter by bot IDs
-    if bot_ids:
-        bot_id_list = bot_ids.split(",")
-        query["bot_id"] = {"$in": bot_id_list}
+    if chat_filter.bot_ids is not None:
+        query["bot_id"] = {"$in": chat_filter.bot_ids}
     
-    # Search by username or name
-    if search:
-        query["$or"] = [
-            {"username": {"$regex": search, "$options": "i"}},
-            {"first_name": {"$regex": search, "$options": "i"}},
-            {"last_name": {"$regex": search, "$options": "i"}}
-        ]
+    # Search by username or name (word prefixes, see chat_search)
+    if chat_filter.search:
+        terms = query_terms(chat_filter.search)
+        # A search without any word characters ("!!!") matches no chat, not every chat
+        query["search_terms"] = {"$all": terms} if terms else {"$in": []}
     
     # Filter unread only
-    if unread_only:
+    if chat_filter.unread_only:
         query["unread_count"] = {"$gt": 0}
     
     # Filter by label
-    if label_id:
-        query["label_ids"] = label_id
+    if chat_filter.label_id:
+        query["label_ids"] = chat_filter.label_id
     
     # Filter by bot status (online/offline)
-    if bot_status:
-        query["bot_status"] = bot_status
+    if chat_filter.bot_status:
+        query["bot_status"] = chat_filter.bot_status
     
-    logger.info(f"Chats query: {query}")
-    chats_cursor = db.chats.find(query, {"_id": 0}).sort("last_message_time", -1)
-    chats = await chats_cursor.to_list(1000)
-    logger.info(f"Found {len(chats)} chats matching query")
-    if len(chats) < 4 and bot_ids:
-        # Debug: check all chats for this bot
-        all_bot_chats = await db.chats.find({"bot_id": {"$in": bot_ids.split(",")}}, {"_id": 0, "first_name": 1, "bot_status": 1}).to_list(1000)
-        logger.info(f"Total chats for bot: {len(all_bot_chats)}, statuses: {[c.get('bot_status') for c in all_bot_chats]}")
-    return [Chat(**chat) for chat in chats]
+    return query
+
+@api_router.get("/chats", response_model=List[Chat])
+async def get_chats(
+    request: Request,
+    bot_ids: Optional[str] = None, 
+    search: Optional[str] = None,
+    unread_only: Optional[bool] = None,
+    label_id: Optional[str] = None,
+    bot_status: Optional[str] = None,
+    fields: Optional[str] = None,
+    allowed: Optional[List[str]] = Depends(get_bot_scope)
+):
+    """Get all chats with optional filtering, only the given `fields` if set"""
+    bot_id_list, version = chat_list_version(scope_bot_ids(split_ids(bot_ids), allowed))
+    etag = resource_etag(request, allowed, version)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    chats = await load_chat_list(
+        ChatFilter(
+            bot_ids=bot_id_list,
+            search=search,
+            unread_only=unread_only,
+            label_id=label_id,
+            bot_status=bot_status
+        ),
+        select_fields(Chat, fields),
+        version
+    )
+    return documents_response(request, chats, etag_headers(etag))
+
+def chat_list_version(bot_id_list: Optional[List[str]]) -> tuple:
+    """Normalized bot ids and the version of their chats"""
+    if bot_id_list is None:
+        return None, resource_versions.version("chats")
+    bot_id_list = sorted(set(bot_id_list))
+    return bot_id_list, tuple(resource_versions.version("chats", bot_id) for bot_id in bot_id_list)
+
+async def load_chat_list(chat_filter: ChatFilter, field_names: List[str], version: tuple) -> List[dict]:
+    """Chats matching filter, shared with other callers of the same data version"""
+    cache_key = (
+        tuple(chat_filter.bot_ids) if chat_filter.bot_ids is not None else None,
+        tuple(query_terms(chat_filter.search)) if chat_filter.search else None,
+        bool(chat_filter.unread_only), chat_filter.label_id, chat_filter.bot_status,
+        tuple(field_names), version
+    )
+    
+    async def load_chats():
+        query = build_chat_query(chat_filter)
+        
+        logger.info(f"Chats query: {query}")
+        chats_cursor = db.chats.find(query, projection(field_names)).sort("last_message_time", -1)
+        chats = await chats_cursor.to_list(1000)
+        logger.info(f"Found {len(chats)} chats matching query")
+        if len(chats) < 4 and chat_filter.bot_ids:
+            # Debug: check all chats for this bot
+            all_bot_chats = await db.chats.find({"bot_id": {"$in": chat_filter.bot_ids}}, {"_id": 0, "first_name": 1, "bot_status": 1}).to_list(1000)
+            logger.info(f"Total chats for bot: {len(all_bot_chats)}, statuses: {[c.get('bot_status') for c in all_bot_chats]}")
+        return lean_documents(chats, field_names, CHAT_DEFAULTS)
+    
+    return await chat_list_cache.get_or_load(cache_key, load_chats)
+
+@api_router.get("/search", response_model=SearchResponse)
+async def search(
+    q: str,
+    bot_ids: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+    allowed: Optional[List[str]] = Depends(get_bot_scope)
+):
+    """Search chats by name and messages by text"""
+    limit = max(1, min(limit, 100))
+    bot_id_list = scope_bot_ids(split_ids(bot_ids), allowed)
+    chats = await chat_search.search_chats(q, bot_id_list, offset, limit)
+    hits = await chat_search.search_messages(q, bot_id_list, offset, limit)
+    return SearchResponse(chats=[Chat(**chat) for chat in chats], messages=hits)
+
+@api_router.get("/chats/suggest")
+async def suggest_chats(
+    q: str,
+    bot_ids: Optional[str] = None,
+    limit: int = 10,
+    allowed: Optional[List[str]] = Depends(get_bot_scope)
+):
+    """Suggest chats whose username or name starts with q"""
+    await typeahead_index.ensure_loaded()
+    return typeahead_index.suggest(q, scope_bot_ids(split_ids(bot_ids), allowed), max(1, min(limit, 50)))
+
+@api_router.get("/chats/facets")
+async def get_chat_facets(bot_ids: Optional[str] = None, allowed: Optional[List[str]] = Depends(get_bot_scope)):
+    """Get chat counts per bot, label and bot status plus unread totals"""
+    return await chat_counts.get_facets(scope_bot_ids(split_ids(bot_ids), allowed))
 
 @api_router.get("/chats/{chat_id}", response_model=Chat)
-async def get_chat(chat_id: str):
+async def get_chat(chat_id: str, allowed: Optional[List[str]] = Depends(get_bot_scope)):
     """Get single chat"""
     chat = await db.chats.find_one({"id": chat_id}, {"_id": 0})
-    if not chat:
+    if not chat or (allowed is not None and chat["bot_id"] not in allowed):
         raise HTTPException(status_code=404, detail="Chat not found")
     return Chat(**chat)
 
 # ============= MESSAGE ENDPOINTS =============
 
 @api_router.get("/messages/{chat_id}", response_model=List[Message])
-async def get_messages(chat_id: str, limit: int = 100):
-    """Get messages for a chat"""
+async def get_messages(
+    chat_id: str,
+    request: Request,
+    limit: int = 100,
+    before: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    allowed: Optional[List[str]] = Depends(get_bot_scope)
+):
+    """Get messages for a chat, older than `before` if given, only the given `fields` if set"""
+    # Scope check first, so out-of-scope callers can't probe versions either
+    chat = await db.chats.find_one({"id": chat_id}, {"_id": 0, "bot_id": 1, "last_read_message_time": 1})
+    if allowed is not None and (chat is None or chat["bot_id"] not in allowed):
+        raise HTTPException(status_code=404, detail="Chat not found")
+    
+    etag = resource_etag(request, allowed, resource_versions.version("messages", chat_id))
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    query = {"chat_id": chat_id}
+    if before:
+        query["created_at"] = {"$lt": before}
+    field_names = select_fields(Message, fields)
+    # Read state and archive paging need these even if not requested
     messages = await db.messages.find(
-        {"chat_id": chat_id}, 
-        {"_id": 0}
+        query, 
+        projection([*field_names, "created_at", "is_from_bot", "is_read"])
     ).sort("created_at", -1).limit(limit).to_list(limit)
     
+    # Hot tier ran out - continue from archived history
+    if len(messages) < limit:
+        archive_before = messages[-1]["created_at"] if messages else before
+        messages += await message_archiver.get_archived_messages(
+            chat_id, archive_before, limit - len(messages)
+        )
+    
+    # Read state comes from the chat read watermark
+    last_read = chat.get("last_read_message_time") if chat else None
+    for msg in messages:
+        msg["is_read"] = (
+            msg.get("is_from_bot", False)
+            or (last_read is not None and msg["created_at"] <= last_read)
+            or msg.get("is_read", False)
+        )
+    
     # Reverse to show oldest first
     messages.reverse()
-    return [Message(**msg) for msg in messages]
+    return documents_response(request, lean_documents(messages, field_names, MESSAGE_DEFAULTS), etag_headers(etag))
 
 @api_router.post("/messages", response_model=Message)
 async def send_message(message_data: MessageCreate):
@@ -259,6 +624,7 @@ async def edit_message(message_id: str, text: dict):
             {"id": message_id},
             {"$set": {"text": text["text"]}}
         )
+        resource_versions.bump("messages", message["chat_id"])
         
         return {"success": True}
     except Exception as e:
@@ -282,6 +648,7 @@ async def delete_message(message_id: str):
         
         # Delete from database
         await db.messages.delete_one({"id": message_id})
+        resource_versions.bump("messages", message["chat_id"])
         
         return {"success": True}
     except Exception as e:
@@ -329,30 +696,69 @@ async def send_file(
         logger.error(f"Failed to send file: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
+# Pipeline update: the watermark is taken from the chat document itself,
+# so a message arriving concurrently is never marked read by accident
+MARK_READ_UPDATE = [
+    {"$set": {"last_read_message_time": "$last_message_time", "unread_count": 0}}
+]
+
 @api_router.patch("/chats/{chat_id}/read")
 async def mark_messages_read(chat_id: str):
-    """Mark all messages in chat as read"""
+    """Mark all messages in chat as read by moving its read watermark"""
     logger.info(f"Marking messages as read for chat_id: {chat_id}")
     
-    result = await db.messages.update_many(
-        {"chat_id": chat_id, "is_read": False},
-        {"$set": {"is_read": True}}
-    )
-    logger.info(f"Updated {result.modified_count} messages")
-    
-    await db.chats.update_one(
+    before = await db.chats.find_one_and_update(
         {"id": chat_id},
-        {"$set": {"unread_count": 0}}
+        MARK_READ_UPDATE,
+        projection=COUNTED_FIELDS,
+        return_document=ReturnDocument.BEFORE
     )
+    if before:
+        chat_counts.apply_change(before, {**before, "unread_count": 0})
+        resource_versions.bump("chats", before["bot_id"])
+        # Read state of messages derives from the chat watermark
+        resource_versions.bump("messages", chat_id)
     
     return {"success": True}
 
+@api_router.post("/chats/read")
+async def mark_chats_read(chat_filter: ChatFilter, allowed: Optional[List[str]] = Depends(get_bot_scope)):
+    """Mark every chat matching filter as read"""
+    chat_filter.bot_ids = scope_bot_ids(chat_filter.bot_ids, allowed)
+    query = build_chat_query(chat_filter)
+    # Only chats with unread messages need their watermark moved
+    query["unread_count"] = {"$gt": 0}
+    
+    chats = await db.chats.find(query, {**COUNTED_FIELDS, "id": 1}).to_list(None)
+    if not chats:
+        return {"success": True, "modified_count": 0}
+    # Each update only applies if the chat is unchanged since it was read,
+    # so the counts can be adjusted by the difference
+    result = await db.chats.bulk_write([
+        UpdateOne({"id": chat["id"], "unread_count": chat["unread_count"]}, MARK_READ_UPDATE)
+        for chat in chats
+    ], ordered=False)
+    if result.matched_count == len(chats):
+        for chat in chats:
+            chat_counts.apply_change(chat, {**chat, "unread_count": 0})
+    else:
+        # Some chats changed in between (new message); recount
+        chat_counts.invalidate()
+    resource_versions.bump("chats")
+    resource_versions.bump("messages")
+    logger.info(f"Marked {result.modified_count} chats as read")
+    
+    return {"success": True, "modified_count": result.modified_count}
+
 # ============= LABEL ENDPOINTS =============
 
 @api_router.get("/labels", response_model=List[LabelResponse])
-async def get_labels():
+async def get_labels(request: Request, response: Response):
     """Get all labels"""
-    labels = await db.labels.find({}, {"_id": 0}).to_list(100)
+    cached = config_not_modified(request, response, "labels")
+    if cached:
+        return cached
+    labels = await config_cache.get("labels")
     return [LabelResponse(**label) for label in labels]
 
 @api_router.post("/labels", response_model=LabelResponse)
@@ -365,50 +771,96 @@ async def create_label(label_data: LabelCreate):
         "created_at": datetime.now(timezone.utc)
     }
     await db.labels.insert_one(label_doc)
+    config_cache.invalidate("labels")
     return LabelResponse(**label_doc)
 
 @api_router.delete("/labels/{label_id}")
 async def delete_label(label_id: str):
     """Delete a label"""
     await db.labels.delete_one({"id": label_id})
-    # Remove label from all chats
+    config_cache.invalidate("labels")
+    invalidate_system_label_ids()
+    # Remove label from chats that carry it
     await db.chats.update_many(
-        {},
+        {"label_ids": label_id},
         {"$pull": {"label_ids": label_id}}
     )
+    chat_counts.invalidate()
+    resource_versions.bump("chats")
     return {"success": True}
 
+# System label ids (like "Покупатели") rarely change, keep them in memory
+_system_label_ids: Optional[List[str]] = None
+
+async def get_system_label_ids() -> List[str]:
+    global _system_label_ids
+    if _system_label_ids is None:
+        system_labels = await db.labels.find({"is_system": True}, {"_id": 0, "id": 1}).to_list(None)
+        _system_label_ids = [label["id"] for label in system_labels]
+    return _system_label_ids
+
+def invalidate_system_label_ids():
+    global _system_label_ids
+    _system_label_ids = None
+
 @api_router.patch("/chats/labels")
 async def set_chat_labels(request: SetLabelsRequest):
     """Set labels for chats - preserves system labels"""
-    # Get chats to preserve their system labels
-    chats = await db.chats.find({"id": {"$in": request.chat_ids}}).to_list(None)
-    
-    # Get system labels (like "Покупатели")
-    system_labels = await db.labels.find({"is_system": True}).to_list(None)
-    system_label_ids = [label["id"] for label in system_labels]
+    system_label_ids = await get_system_label_ids()
     
-    # Update each chat, preserving system labels
+    chats = await db.chats.find({"id": {"$in": request.chat_ids}}, {**COUNTED_FIELDS, "id": 1}).to_list(None)
+    changes = []
     for chat in chats:
-        existing_labels = chat.get("label_ids", [])
-        # Keep system labels that were already on the chat
-        preserved_system_labels = [lid for lid in existing_labels if lid in system_label_ids]
-        # Combine new labels with preserved system labels
-        final_labels = list(set(request.label_ids + preserved_system_labels))
-        
-        await db.chats.update_one(
-            {"id": chat["id"]},
-            {"$set": {"label_ids": final_labels}}
-        )
+        # New labels plus system labels already on the chat
+        label_ids = list(dict.fromkeys(request.label_ids))
+        label_ids += [
+            label_id for label_id in chat.get("label_ids") or []
+            if label_id in system_label_ids and label_id not in label_ids
+        ]
+        changes.append((chat, label_ids))
+    if changes:
+        # Each update only applies if the chat's labels are unchanged since
+        # they were read, so the counts can be adjusted by the difference
+        result = await db.chats.bulk_write([
+            UpdateOne({"id": chat["id"], "label_ids": chat.get("label_ids")}, {"$set": {"label_ids": label_ids}})
+            for chat, label_ids in changes
+        ], ordered=False)
+        if result.matched_count == len(changes):
+            for chat, label_ids in changes:
+                chat_counts.apply_change(chat, {**chat, "label_ids": label_ids})
+        else:
+            chat_counts.invalidate()
+        resource_versions.bump("chats")
     
     return {"success": True}
 
+@api_router.post("/chats/labels/apply")
+async def apply_label_by_filter(request: ApplyLabelRequest, allowed: Optional[List[str]] = Depends(get_bot_scope)):
+    """Add (or remove) a label on every chat matching filter"""
+    request.filter.bot_ids = scope_bot_ids(request.filter.bot_ids, allowed)
+    # Skip chats that already are in the requested state
+    if request.remove:
+        label_query = {"label_ids": request.label_id}
+        update = {"$pull": {"label_ids": request.label_id}}
+    else:
+        label_query = {"label_ids": {"$ne": request.label_id}}
+        update = {"$addToSet": {"label_ids": request.label_id}}
+    
+    query = {"$and": [build_chat_query(request.filter), label_query]}
+    result = await db.chats.update_many(query, update)
+    chat_counts.invalidate()
+    resource_versions.bump("chats")
+    return {"success": True, "modified_count": result.modified_count}
+
 # ============= QUICK REPLY ENDPOINTS =============
 
 @api_router.get("/quick-replies", response_model=List[QuickReplyResponse])
-async def get_quick_replies():
+async def get_quick_replies(request: Request, response: Response):
     """Get all quick replies"""
-    replies = await db.quick_replies.find({}, {"_id": 0}).to_list(100)
+    cached = config_not_modified(request, response, "quick_replies")
+    if cached:
+        return cached
+    replies = await config_cache.get("quick_replies")
     return [QuickReplyResponse(**reply) for reply in replies]
 
 @api_router.post("/quick-replies", response_model=QuickReplyResponse)
@@ -421,20 +873,25 @@ async def create_quick_reply(reply_data: QuickReplyCreate):
         "created_at": datetime.now(timezone.utc)
     }
     await db.quick_replies.insert_one(reply_doc)
+    config_cache.invalidate("quick_replies")
     return QuickReplyResponse(**reply_doc)
 
 @api_router.delete("/quick-replies/{reply_id}")
 async def delete_quick_reply(reply_id: str):
     """Delete a quick reply"""
     await db.quick_replies.delete_one({"id": reply_id})
+    config_cache.invalidate("quick_replies")
     return {"success": True}
 
 # ============= AUTO REPLY ENDPOINTS =============
 
 @api_router.get("/auto-replies", response_model=List[AutoReplyResponse])
-async def get_auto_replies():
+async def get_auto_replies(request: Request, response: Response):
     """Get all auto replies"""
-    replies = await db.auto_replies.find({}, {"_id": 0}).to_list(100)
+    cached = config_not_modified(request, response, "auto_replies")
+    if cached:
+        return cached
+    replies = await config_cache.get("auto_replies")
     return [AutoReplyResponse(**reply) for reply in replies]
 
 @api_router.post("/auto-replies", response_model=AutoReplyResponse)
@@ -448,6 +905,7 @@ async def create_auto_reply(reply_data: AutoReplyCreate):
         "created_at": datetime.now(timezone.utc)
     }
     await db.auto_replies.insert_one(reply_doc)
+    config_cache.invalidate("auto_replies")
     return AutoReplyResponse(**reply_doc)
 
 @api_router.patch("/auto-replies/{reply_id}")
@@ -461,20 +919,25 @@ async def update_auto_reply(reply_id: str, reply_data: AutoReplyCreate):
             "is_active": reply_data.is_active
         }}
     )
+    config_cache.invalidate("auto_replies")
     return {"success": True}
 
 @api_router.delete("/auto-replies/{reply_id}")
 async def delete_auto_reply(reply_id: str):
     """Delete an auto reply"""
     await db.auto_replies.delete_one({"id": reply_id})
+    config_cache.invalidate("auto_replies")
     return {"success": True}
 
 # ============= WELCOME MESSAGE ENDPOINTS =============
 
 @api_router.get("/welcome-messages", response_model=List[WelcomeMessageResponse])
-async def get_welcome_messages():
+async def get_welcome_messages(request: Request, response: Response):
     """Get all welcome messages"""
-    messages = await db.welcome_messages.find({}, {"_id": 0}).to_list(100)
+    cached = config_not_modified(request, response, "welcome_messages")
+    if cached:
+        return cached
+    messages = await config_cache.get("welcome_messages")
     return [WelcomeMessageResponse(**msg) for msg in messages]
 
 @api_router.post("/welcome-messages")
@@ -511,6 +974,7 @@ async def create_welcome_message(message_data: WelcomeMessageCreate):
             }
             await db.welcome_messages.insert_one(msg_doc)
             created_messages.append(msg_doc)
+    config_cache.invalidate("welcome_messages")
     
     return {"success": True, "messages": created_messages}
 
@@ -524,20 +988,25 @@ async def update_welcome_message(message_id: str, message_data: WelcomeMessageCr
             "is_active": message_data.is_active
         }}
     )
+    config_cache.invalidate("welcome_messages")
     return {"success": True}
 
 @api_router.delete("/welcome-messages/{message_id}")
 async def delete_welcome_message(message_id: str):
     """Delete a welcome message"""
     await db.welcome_messages.delete_one({"id": message_id})
+    config_cache.invalidate("welcome_messages")
     return {"success": True}
 
 # ============= MENU BUTTON ENDPOINTS =============
 
 @api_router.get("/menu-buttons", response_model=List[MenuButtonResponse])
-async def get_menu_buttons():
+async def get_menu_buttons(request: Request, response: Response):
     """Get all menu buttons"""
-    buttons = await db.menu_buttons.find({}, {"_id": 0}).to_list(100)
+    cached = config_not_modified(request, response, "menu_buttons")
+    if cached:
+        return cached
+    buttons = await config_cache.get("menu_buttons")
     return [MenuButtonResponse(**btn) for btn in buttons]
 
 @api_router.post("/menu-buttons", response_model=MenuButtonResponse)
@@ -552,6 +1021,7 @@ async def create_menu_button(button_data: MenuButtonCreate):
         "created_at": datetime.now(timezone.utc)
     }
     await db.menu_buttons.insert_one(button_doc)
+    config_cache.invalidate("menu_buttons")
     return MenuButtonResponse(**button_doc)
 
 
@@ -565,6 +1035,7 @@ async def update_menu_button(button_id: str, button_data: MenuButtonCreate):
         {"id": button_id},
         {"$set": button_dict}
     )
+    config_cache.invalidate("menu_buttons")
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Button not found")
@@ -576,14 +1047,18 @@ async def update_menu_button(button_id: str, button_data: MenuButtonCreate):
 async def delete_menu_button(button_id: str):
     """Delete a menu button"""
     await db.menu_buttons.delete_one({"id": button_id})
+    config_cache.invalidate("menu_buttons")
     return {"success": True}
 
 # ============= BOT MENU ENDPOINTS =============
 
 @api_router.get("/bot-menus", response_model=List[BotMenuResponse])
-async def get_bot_menus():
+async def get_bot_menus(request: Request, response: Response):
     """Get all bot menus"""
-    menus = await db.bot_menus.find({}, {"_id": 0}).to_list(100)
+    cached = config_not_modified(request, response, "bot_menus")
+    if cached:
+        return cached
+    menus = await config_cache.get("bot_menus")
     return [BotMenuResponse(**menu) for menu in menus]
 
 @api_router.post("/bot-menus", response_model=BotMenuResponse)
@@ -596,6 +1071,7 @@ async def create_bot_menu(menu_data: BotMenuCreate):
         "created_at": datetime.now(timezone.utc)
     }
     await db.bot_menus.insert_one(menu_doc)
+    config_cache.invalidate("bot_menus")
     return BotMenuResponse(**menu_doc)
 
 @api_router.patch("/bot-menus/{menu_id}")
@@ -608,6 +1084,7 @@ async def update_bot_menu(menu_id: str, menu_data: BotMenuCreate):
             "button_ids": menu_data.button_ids
         }}
     )
+    config_cache.invalidate("bot_menus")
     return {"success": True}
 
 @api_router.put("/bot-menus/{menu_id}", response_model=BotMenuResponse)
@@ -624,6 +1101,7 @@ async def update_bot_menu_full(menu_id: str, menu_data: BotMenuCreate):
         {"id": menu_id},
         {"$set": menu_dict}
     )
+    config_cache.invalidate("bot_menus")
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Menu not found")
@@ -636,6 +1114,7 @@ async def update_bot_menu_full(menu_id: str, menu_data: BotMenuCreate):
 async def delete_bot_menu(menu_id: str):
     """Delete a bot menu"""
     await db.bot_menus.delete_one({"id": menu_id})
+    config_cache.invalidate("bot_menus")
     # Remove from bot assignments
     await db.bot_menu_assignments.delete_many({"menu_id": menu_id})
     return {"success": True}
@@ -643,18 +1122,18 @@ async def delete_bot_menu(menu_id: str):
 # ============= BOT MENU ASSIGNMENT ENDPOINTS =============
 
 @api_router.get("/bot-menu-assignments", response_model=List[BotMenuAssignmentResponse])
-async def get_bot_menu_assignments():
+async def get_bot_menu_assignments(loaders: RequestLoaders = Depends(get_loaders)):
     """Get all bot-menu assignments"""
-    assignments = await db.bot_menu_assignments.find({}, {"_id": 0}).to_list(100)
-    result = []
-    for assignment in assignments:
-        menu = await db.bot_menus.find_one({"id": assignment["menu_id"]})
-        result.append({
+    assignments = await db.bot_menu_assignments.find({}, {"_id": 0}).to_list(None)
+    menus = await loaders.bot_menus.load_many(assignment["menu_id"] for assignment in assignments)
+    return [
+        {
             "bot_id": assignment["bot_id"],
             "menu_id": assignment["menu_id"],
             "menu_name": menu["name"] if menu else None
-        })
-    return result
+        }
+        for assignment, menu in zip(assignments, menus)
+    ]
 
 @api_router.post("/bot-menu-assignments")
 async def assign_menu_to_bot(assignment: BotMenuAssignment):
@@ -687,13 +1166,33 @@ async def remove_bot_menu_assignment(bot_id: str):
     return {"success": True}
 
 @api_router.get("/stats")
-async def get_stats():
+async def get_stats(request: Request, allowed: Optional[List[str]] = Depends(get_bot_scope)):
     """Get statistics"""
-    total_bots = await db.bots.count_documents({})
-    active_bots = await db.bots.count_documents({"is_active": True})
-    total_chats = await db.chats.count_documents({})
-    total_messages = await db.messages.count_documents({})
+    etag = resource_etag(
+        request, allowed, *stats_versions()
+    )
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    return ORJSONResponse(await compute_stats(allowed), headers=etag_headers(etag))
+
+def stats_versions() -> tuple:
+    return tuple(resource_versions.version(name) for name in ("bots", "chats", "messages"))
+
+async def compute_stats(allowed: Optional[List[str]]) -> dict:
+    bot_query = {} if allowed is None else {"id": {"$in": allowed}}
+    data_query = {} if allowed is None else {"bot_id": {"$in": allowed}}
+    total_bots = await db.bots.count_documents(bot_query)
+    active_bots = await db.bots.count_documents({**bot_query, "is_active": True})
+    total_chats = await db.chats.count_documents(data_query)
+    total_messages = await db.messages.count_documents(data_query)
+    archived = await db.message_archive.aggregate([
+        {"$match": data_query},
+        {"$group": {"_id": None, "total": {"$sum": "$count"}}}
+    ]).to_list(1)
+    total_messages += archived[0]["total"] if archived else 0
     unread_count = await db.chats.aggregate([
+        {"$match": data_query},
         {"$group": {"_id": None, "total": {"$sum": "$unread_count"}}}
     ]).to_list(1)
     
@@ -705,6 +1204,54 @@ async def get_stats():
         "total_unread": unread_count[0]["total"] if unread_count else 0
     }
 
+# ============= INBOX BOOTSTRAP =============
+
+@api_router.get("/inbox/bootstrap")
+async def inbox_bootstrap(
+    request: Request,
+    bot_ids: Optional[str] = None,
+    allowed: Optional[List[str]] = Depends(get_bot_scope)
+):
+    """Everything the inbox needs for its first render in one response.
+
+    Chats and facets are for `bot_ids`, by default all active bots the
+    caller can see (the panel's initial selection). `version` is the ETag
+    of the whole payload.
+    """
+    bots = [
+        bot for bot in await config_cache.get("bots")
+        if allowed is None or bot["id"] in allowed
+    ]
+    if bot_ids:
+        selected = scope_bot_ids(split_ids(bot_ids), allowed)
+    else:
+        selected = [bot["id"] for bot in bots if bot.get("is_active")]
+    selected, chats_version = chat_list_version(selected)
+    
+    etag = resource_etag(
+        request, allowed, chats_version, *stats_versions(),
+        config_cache.version("bots"), config_cache.version("labels")
+    )
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    labels, stats, facets, chats = await asyncio.gather(
+        config_cache.get("labels"),
+        compute_stats(allowed),
+        chat_counts.get_facets(selected),
+        load_chat_list(ChatFilter(bot_ids=selected), select_fields(Chat, None), chats_version)
+    )
+    return documents_response(request, {
+        "bots": [BotResponse(**bot).model_dump() for bot in bots],
+        "selected_bot_ids": selected,
+        "labels": [LabelResponse(**label).model_dump() for label in labels],
+        "stats": stats,
+        "facets": facets,
+        "chats": chats,
+        "version": etag
+    }, etag_headers(etag))
+
 
 
 
@@ -806,6 +1353,8 @@ async def create_or_update_sale(chat_id: str, sale: SaleCreate):
                 "is_system": True
             }
             await db.labels.insert_one(buyers_label)
+            config_cache.invalidate("labels")
+            invalidate_system_label_ids()
         
         buyers_label_id = buyers_label["id"]
         
@@ -817,7 +1366,7 @@ async def create_or_update_sale(chat_id: str, sale: SaleCreate):
             raise HTTPException(status_code=404, detail="Chat not found")
         
         # Add buyers label if not already present
-        label_ids = chat.get("label_ids", [])
+        label_ids = list(chat.get("label_ids", []))
         if buyers_label_id not in label_ids:
             label_ids.append(buyers_label_id)
         
@@ -832,6 +1381,8 @@ async def create_or_update_sale(chat_id: str, sale: SaleCreate):
                 }
             }
         )
+        chat_counts.apply_change(chat, {**chat, "label_ids": label_ids})
+        resource_versions.bump("chats", chat["bot_id"])
         
         return SaleResponse(
             chat_id=chat_id,
@@ -863,7 +1414,7 @@ async def remove_sale(chat_id: str):
             raise HTTPException(status_code=404, detail="Chat not found")
         
         # Remove buyers label
-        label_ids = chat.get("label_ids", [])
+        label_ids = list(chat.get("label_ids", []))
         if buyers_label_id in label_ids:
             label_ids.remove(buyers_label_id)
         
@@ -879,6 +1430,8 @@ async def remove_sale(chat_id: str):
                 }
             }
         )
+        chat_counts.apply_change(chat, {**chat, "label_ids": label_ids})
+        resource_versions.bump("chats", chat["bot_id"])
         
         return {"success": True}
     except HTTPException:
@@ -888,17 +1441,22 @@ async def remove_sale(chat_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/statistics/sales", response_model=SalesStatistics)
-async def get_sales_statistics():
+async def get_sales_statistics(loaders: RequestLoaders = Depends(get_loaders)):
     """Get sales statistics by day and by bot"""
     try:
         # Get all chats with sales
         chats_with_sales = await db.chats.find(
-            {"sale_amount": {"$ne": None}}
+            {"sale_amount": {"$ne": None}},
+            {"_id": 0, "bot_id": 1, "sale_amount": 1, "sale_date": 1}
         ).to_list(None)
         
         total_sales = sum(chat.get("sale_amount", 0) for chat in chats_with_sales)
         total_buyers = len(chats_with_sales)
         
+        # Bots of all sales in one query
+        bot_ids = list({chat["bot_id"] for chat in chats_with_sales})
+        bots = dict(zip(bot_ids, await loaders.bots.load_many(bot_ids)))
+        
         # Group by bot
         sales_by_bot = {}
         for chat in chats_with_sales:
@@ -907,7 +1465,7 @@ async def get_sales_statistics():
             
             # Get bot info
             if bot_id not in sales_by_bot:
-                bot = await db.bots.find_one({"id": bot_id})
+                bot = bots[bot_id]
                 bot_username = bot.get("username", "Unknown") if bot else "Unknown"
                 sales_by_bot[bot_id] = {
                     "bot_username": bot_username,
@@ -957,7 +1515,7 @@ async def get_sales_statistics():
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/labels/{label_id}/export-usernames")
-async def export_usernames_by_label(label_id: str):
+async def export_usernames_by_label(label_id: str, allowed: Optional[List[str]] = Depends(get_bot_scope)):
     """Export usernames of users with specific label to TXT file"""
     try:
         # Get label
@@ -966,9 +1524,10 @@ async def export_usernames_by_label(label_id: str):
             raise HTTPException(status_code=404, detail="Label not found")
         
         # Get all chats with this label
-        chats = await db.chats.find(
-            {"label_ids": label_id}
-        ).to_list(None)
+        query = {"label_ids": label_id}
+        if allowed is not None:
+            query["bot_id"] = {"$in": allowed}
+        chats = await db.chats.find(query).to_list(None)
         
         if not chats:
             raise HTTPException(status_code=404, detail="No chats found with this label")
@@ -998,6 +1557,75 @@ async def export_usernames_by_label(label_id: str):
         logger.error(f"Error exporting usernames: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# ============= EXPORT ENDPOINTS =============
+
+@api_router.post("/exports/messages", response_model=MessageExportResponse)
+async def create_message_export(
+    export_data: MessageExportCreate,
+    allowed: Optional[List[str]] = Depends(get_bot_scope)
+):
+    """Start background export of bot message history to compressed files"""
+    ensure_bot_access(export_data.bot_id, allowed)
+    try:
+        job = await message_exporter.start_export(
+            export_data.bot_id,
+            export_data.since,
+            export_data.until,
+            export_data.format,
+            export_data.resume_token
+        )
+        return MessageExportResponse(**job)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/exports/{job_id}", response_model=MessageExportResponse)
+async def get_message_export(job_id: str, allowed: Optional[List[str]] = Depends(get_bot_scope)):
+    """Get export job progress, throughput and resume token"""
+    job = await message_exporter.get_job(job_id)
+    if not job or (allowed is not None and job["bot_id"] not in allowed):
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return MessageExportResponse(**job)
+
+@api_router.get("/exports/{job_id}/files/{file_name}")
+async def download_message_export(
+    job_id: str,
+    file_name: str,
+    allowed: Optional[List[str]] = Depends(get_bot_scope)
+):
+    """Download a finished export part file"""
+    job = await message_exporter.get_job(job_id)
+    if not job or (allowed is not None and job["bot_id"] not in allowed):
+        raise HTTPException(status_code=404, detail="Export job not found")
+    file_path = message_exporter.file_path(job, file_name)
+    if not file_path or not file_path.exists():
+        raise HTTPException(status_code=404, detail="Export file not found")
+    return FileResponse(file_path, media_type='application/octet-stream', filename=file_name)
+
+# ============= BATCH ENDPOINT =============
+
+BATCH_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE")
+BATCH_MAX_OPERATIONS = int(os.environ.get('BATCH_MAX_OPERATIONS', '100'))
+
+@api_router.post("/batch", response_model=BatchResponse)
+async def run_batch(batch: BatchRequest, request: Request):
+    """Run several API operations in one request, results in request order"""
+    if len(batch.operations) > BATCH_MAX_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_OPERATIONS} operations per batch")
+    
+    operations = []
+    for index, op in enumerate(batch.operations):
+        method = op.method.upper()
+        if method not in BATCH_METHODS:
+            raise HTTPException(status_code=400, detail=f"Unsupported method: {op.method}")
+        operations.append({**op.model_dump(), "id": op.id or str(index), "method": method})
+    try:
+        batch_executor.validate(operations)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    results = await batch_executor.run(operations, dict(request.headers))
+    return BatchResponse(results=results)
+
 # ============= USER MANAGEMENT ENDPOINTS =============
 
 @api_router.post("/users", response_model=UserResponse)
@@ -1018,6 +1646,8 @@ async def create_user(user_data: UserCreate):
             "password": user_data.password,
             "access_token": access_token,
             "bot_ids": user_data.bot_ids,
+            # An empty list means every bot; see AccessControl.get_allowed_bot_ids
+            "restricted": bool(user_data.bot_ids),
             "role": user_data.role,
             "created_at": datetime.now(timezone.utc).isoformat()
         }
@@ -1095,12 +1725,14 @@ async def update_user(user_id: str, user_data: UserUpdate):
         
         if user_data.bot_ids is not None:
             update_data["bot_ids"] = user_data.bot_ids
+            update_data["restricted"] = bool(user_data.bot_ids)
         
         if update_data:
             await db.users.update_one(
                 {"id": user_id},
                 {"$set": update_data}
             )
+            access_control.invalidate_user(user_id)
         
         # Get updated user
         updated_user = await db.users.find_one({"id": user_id})
@@ -1131,9 +1763,10 @@ async def delete_user(user_id: str):
         raise HTTPException(status_code=403, detail="Cannot delete admin user")
     
     result = await db.users.delete_one({"id": user_id})
+    access_control.invalidate_user(user_id)
     return {"success": True}
 
-@api_router.post("/auth/login", response_model=UserResponse)
+@public_router.post("/auth/login", response_model=UserResponse)
 async def login(login_data: LoginRequest):
     """Login with username and password"""
     user = await db.users.find_one({
@@ -1158,10 +1791,10 @@ async def login(login_data: LoginRequest):
         created_at=created_at
     )
 
-@api_router.get("/auth/token/{token}", response_model=UserResponse)
+@public_router.get("/auth/token/{token}", response_model=UserResponse)
 async def login_by_token(token: str):
     """Login with access token"""
-    user = await db.users.find_one({"access_token": token})
+    user = await access_control.get_user(token)
     
     if not user:
         raise HTTPException(status_code=401, detail="Invalid token")
@@ -1181,12 +1814,18 @@ async def login_by_token(token: str):
     )
 
 # Health check
-@api_router.get("/")
+@public_router.get("/")
 async def root():
     return {"message": "Telegram Chat Panel API", "status": "running"}
 
-# Include the router in the main app
-app.include_router(api_router)
+# In-process execution of /batch operations
+batch_executor = BatchExecutor(
+    app, "/api", int(os.environ.get('BATCH_CONCURRENCY', '8'))
+)
+
+# Include the routers in the main app
+app.include_router(api_router, dependencies=[Depends(require_user)])
+app.include_router(public_router)
 
 app.add_middleware(
     CORSMiddleware,
@@ -1196,6 +1835,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.environ.get('COMPRESSION_MIN_SIZE', '1024')),
+    gzip_level=int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6')),
+    brotli_quality=int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4'))
+)
+
+# Background work started with the app; the event loop only keeps weak references to tasks
+startup_tasks: List[asyncio.Task] = []
+
+async def ensure_indexes():
+    """Create all indexes, one subsystem after another"""
+    steps = [
+        ("users", access_control.ensure_indexes),
+        ("telegram", telegram_manager.ensure_indexes),
+        ("export", message_exporter.ensure_indexes),
+        ("archive", message_archiver.ensure_indexes),
+        ("bot deletion", bot_deletion_manager.ensure_indexes),
+        ("labels", lambda: db.chats.create_index("label_ids")),
+        ("search", chat_search.ensure_indexes),
+    ]
+    for name, ensure in steps:
+        try:
+            await ensure()
+        except Exception as e:
+            logger.error(f"Failed to create {name} indexes: {e}")
+    logger.info("Index build finished")
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize bots on startup and create system labels"""
@@ -1212,23 +1879,44 @@ async def startup_event():
             "is_system": True
         }
         await db.labels.insert_one(buyers_label)
+        config_cache.invalidate("labels")
         logger.info("Created system label: Покупатели")
     
+    # Building indexes on large collections takes a while; serve meanwhile
+    startup_tasks.append(asyncio.create_task(ensure_indexes()))
+    await message_exporter.resume_pending()
+    message_archiver.start()
+    await bot_deletion_manager.resume_pending()
+    startup_tasks.append(asyncio.create_task(chat_search.backfill()))
+    startup_tasks.append(asyncio.create_task(typeahead_index.ensure_loaded()))
+    
+    # Bots start in background so the API is served right away;
+    # progress is visible at /api/bots/states
     logger.info("Loading existing bots")
-    bots = await db.bots.find({"is_active": True}).to_list(100)
-    for bot in bots:
-        try:
-            await telegram_manager.add_bot(bot["id"], bot["token"])
-            logger.info(f"Loaded bot: {bot['username']}")
-        except Exception as e:
-            logger.error(f"Failed to load bot {bot['id']}: {e}")
+    bots = await db.bots.find(
+        {"$or": [{"is_active": True}, {"quarantined_at": {"$exists": True}}]}
+    ).to_list(None)
+    startup_tasks.append(asyncio.create_task(telegram_manager.start_bots(bots)))
+    bot_supervisor.start()
+    bot_hibernator.start()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    """Shutdown all bots"""
-    for bot_id in list(telegram_manager.applications.keys()):
-        try:
-            await telegram_manager.remove_bot(bot_id)
-        except Exception as e:
-            logger.error(f"Failed to remove bot {bot_id}: {e}")
+    """Stop background work and all bots, then close Mongo"""
+    # No restarts or wake-ups while bots go down
+    await bot_supervisor.stop()
+    await bot_hibernator.stop()
+    await message_archiver.stop()
+    for task in startup_tasks:
+        task.cancel()
+    await asyncio.gather(*startup_tasks, return_exceptions=True)
+    startup_tasks.clear()
+    # Jobs keep their checkpoints and resume on next startup
+    await message_exporter.stop()
+    await bot_deletion_manager.stop()
+    try:
+        await telegram_manager.shutdown()
+    except Exception as e:
+        logger.error(f"Failed to stop bots: {e}")
+    await telegram_manager.close()
     client.close()
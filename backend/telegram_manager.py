@@ -1,79 +1,464 @@
 import asyncio
 import logging
+import os
+import time
 import traceback
-from typing import Dict, Optional, List
-from telegram import Bot, Update, File
-from telegram.ext import Application, MessageHandler, filters, ContextTypes
-from telegram.error import TelegramError
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, List, Set, Tuple
+from telegram import Bot, Update, File, User
+from telegram.ext import (
+    Application, ApplicationHandlerStop, ExtBot, MessageHandler, TypeHandler, filters, ContextTypes
+)
+from telegram.error import InvalidToken, TelegramError
 from datetime import datetime, timezone
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
 import uuid
 
+from chat_counts import get_chat_counts, COUNTED_FIELDS
+from chat_search import SEARCH_TERMS_VERSION, search_terms
+from typeahead import get_typeahead_index
+from versions import get_resource_versions
+from config_cache import get_config_cache
+from telegram_request import TelegramRequests
+
 logger = logging.getLogger(__name__)
 
+
+class _ManagedBot(ExtBot):
+    """Bot with a cached identity that reports the outcome of each poll.
+
+    get_me answers from the identity stored in the bots collection, which
+    saves the getMe round trip PTB makes on initialize when restarting known
+    bots; an invalid token then surfaces on the first getUpdates instead.
+    Every getUpdates outcome is passed to on_poll as (error, updates) so the
+    supervisor can tell a live bot from a dead one and idle bots can be
+    hibernated.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        identity: Optional[dict] = None,
+        on_poll: Optional[Callable[[Optional[Exception], tuple], None]] = None,
+        **kwargs
+    ):
+        super().__init__(token, **kwargs)
+        self._identity = identity
+        self._on_poll = on_poll
+
+    async def get_me(self, *args, **kwargs) -> User:
+        if self._identity and self._bot_user is None:
+            self._bot_user = User(
+                id=self._identity["telegram_id"],
+                first_name=self._identity["first_name"],
+                is_bot=True,
+                username=self._identity["username"]
+            )
+            self._bot_user.set_bot(self)
+        if self._bot_user is not None:
+            return self._bot_user
+        return await super().get_me(*args, **kwargs)
+
+    async def get_updates(self, *args, **kwargs):
+        try:
+            updates = await super().get_updates(*args, **kwargs)
+        except Exception as e:
+            if self._on_poll:
+                self._on_poll(e, ())
+            raise
+        if self._on_poll:
+            self._on_poll(None, updates)
+        return updates
+
+
+class RecentUpdates:
+    """The last `size` update ids seen for one bot"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._ids: Set[int] = set()
+        self._order: Deque[int] = deque()
+
+    def add(self, update_id: int) -> bool:
+        """Remember an update id; False if it was already seen"""
+        if update_id in self._ids:
+            return False
+        self._ids.add(update_id)
+        self._order.append(update_id)
+        if len(self._order) > self.size:
+            self._ids.discard(self._order.popleft())
+        return True
+
+
 class TelegramBotManager:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         self.applications: Dict[str, Application] = {}
         self.bots: Dict[str, Bot] = {}
+        # bot_id -> {"state": pending|starting|running|hibernating|failed|stopped|quarantined,
+        #            "error", "retry_at", "updated_at"}
+        self.states: Dict[str, dict] = {}
+        # bot_id -> (monotonic time of last successful getUpdates, last getUpdates error)
+        self.polls: Dict[str, Tuple[float, Optional[Exception]]] = {}
+        # bot_id -> monotonic time of the last update received
+        self.activity: Dict[str, float] = {}
+        self.shutdown_drain_seconds = float(os.environ.get("BOT_SHUTDOWN_DRAIN_SECONDS", "10"))
+        # bot_id -> ids of recently received updates, to drop redeliveries
+        self.recent_updates: Dict[str, RecentUpdates] = {}
+        self.dedupe_window = int(os.environ.get("UPDATE_DEDUPE_WINDOW", "200"))
+        # Telegram keeps unconfirmed updates for 24 hours, so claims outlive any
+        # redelivery and expire long before update ids restart after a quiet week
+        self.update_claim_ttl_hours = float(os.environ.get("UPDATE_CLAIM_TTL_HOURS", "48"))
+        self.startup_concurrency = int(os.environ.get("BOT_STARTUP_CONCURRENCY", "10"))
+        # Connection pools shared by all bots
+        self.requests = TelegramRequests()
+    
+    async def ensure_indexes(self):
+        # One claim per update, see _claim_update
+        await self.db.processed_updates.create_index(
+            [("bot_id", ASCENDING), ("update_id", ASCENDING)], unique=True
+        )
+        await self.db.processed_updates.create_index(
+            "created_at", expireAfterSeconds=int(self.update_claim_ttl_hours * 3600)
+        )
+        # Each Telegram message is stored once per direction. Telegram message
+        # ids are only unique within one Telegram chat, and a panel chat
+        # collects one user's private and group messages.
+        if "chat_id_1_telegram_message_id_1_is_from_bot_1" in await self.db.messages.index_information():
+            # Earlier key without the Telegram chat
+            await self.db.messages.drop_index("chat_id_1_telegram_message_id_1_is_from_bot_1")
+        try:
+            await self._create_message_index()
+        except OperationFailure as e:
+            if e.code != 11000:
+                raise
+            # Copies stored before the index existed
+            await self._remove_duplicate_messages()
+            await self._create_message_index()
+    
+    async def _create_message_index(self):
+        await self.db.messages.create_index(
+            [
+                ("chat_id", ASCENDING), ("telegram_chat_id", ASCENDING),
+                ("telegram_message_id", ASCENDING), ("is_from_bot", ASCENDING)
+            ],
+            unique=True,
+            partialFilterExpression={"telegram_message_id": {"$type": "number"}}
+        )
+    
+    async def _remove_duplicate_messages(self):
+        """Delete all but the first stored copy of each Telegram message"""
+        pipeline = [
+            {"$match": {"telegram_message_id": {"$type": "number"}}},
+            {"$sort": {"_id": ASCENDING}},
+            {"$group": {
+                "_id": {
+                    "chat_id": "$chat_id",
+                    "telegram_chat_id": "$telegram_chat_id",
+                    "telegram_message_id": "$telegram_message_id",
+                    "is_from_bot": "$is_from_bot"
+                },
+                "ids": {"$push": "$_id"}
+            }},
+            {"$match": {"ids.1": {"$exists": True}}}
+        ]
+        removed = 0
+        async for group in self.db.messages.aggregate(pipeline, allowDiskUse=True):
+            result = await self.db.messages.delete_many({"_id": {"$in": group["ids"][1:]}})
+            removed += result.deleted_count
+        logger.warning(f"Removed {removed} duplicate Telegram messages")
+    
+    def set_state(self, bot_id: str, state: str, error: Optional[str] = None, retry_at: Optional[datetime] = None):
+        self.states[bot_id] = {
+            "state": state,
+            "error": error,
+            "retry_at": retry_at,
+            "updated_at": datetime.now(timezone.utc)
+        }
+    
+    def get_state(self, bot_id: str) -> Optional[dict]:
+        return self.states.get(bot_id)
+    
+    def _record_poll(self, bot_id: str, error: Optional[Exception], updates: tuple):
+        last_ok = self.polls.get(bot_id, (time.monotonic(), None))[0]
+        self.polls[bot_id] = (time.monotonic(), None) if error is None else (last_ok, error)
+        if updates:
+            self.activity[bot_id] = time.monotonic()
+    
+    async def start_bots(self, bots: List[dict]):
+        """Start stored bots concurrently, at most startup_concurrency at a time.
+        
+        Quarantined bots are not started, only reported as quarantined.
+        """
+        semaphore = asyncio.Semaphore(self.startup_concurrency)
+        for bot in bots:
+            if bot.get("quarantined_at"):
+                self.set_state(bot["id"], "quarantined", bot.get("quarantine_reason"))
+            else:
+                self.set_state(bot["id"], "pending")
         
-    async def add_bot(self, bot_id: str, token: str) -> dict:
-        """Add a new bot and start listening for messages"""
+        async def start(bot: dict):
+            async with semaphore:
+                try:
+                    bot_info = await self.start_stored_bot(bot)
+                except Exception as e:
+                    logger.error(f"Failed to load bot {bot['id']}: {e}")
+                    return
+                logger.info(f"Loaded bot: {bot_info['username']}")
+        
+        startable = [bot for bot in bots if not bot.get("quarantined_at")]
+        await asyncio.gather(*(start(bot) for bot in startable))
+        running = sum(1 for state in self.states.values() if state["state"] == "running")
+        logger.info(f"Started {running} of {len(startable)} bots")
+    
+    async def start_stored_bot(self, bot: dict) -> dict:
+        """Start a bot from its document, remembering its identity on first start"""
+        identity = bot if bot.get("telegram_id") else None
+        bot_info = await self.add_bot(bot["id"], bot["token"], identity)
+        if not identity:
+            # Remember identity so the next start skips getMe
+            await self.db.bots.update_one({"id": bot["id"]}, {"$set": {
+                "telegram_id": bot_info["telegram_id"],
+                "username": bot_info["username"],
+                "first_name": bot_info["first_name"]
+            }})
+            get_config_cache(self.db).invalidate("bots")
+        return bot_info
+        
+    async def add_bot(self, bot_id: str, token: str, identity: Optional[dict] = None) -> dict:
+        """Add a new bot and start listening for messages.
+
+        identity (telegram_id, username, first_name) of a known bot skips getMe.
+        A token Telegram rejects puts the bot in quarantine.
+        """
+        self.set_state(bot_id, "starting")
+        application = None
         try:
-            # Create bot instance
-            bot = Bot(token=token)
-            bot_info = await bot.get_me()
-            
             # Create application
-            application = Application.builder().token(token).build()
-            
-            # Add message handler
-            async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-                await self._handle_incoming_message(update, bot_id)
-            
-            # Add callback query handler for button presses
-            async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
-                await self._handle_button_press(update, bot_id)
-            
-            # Add my_chat_member handler for bot block/unblock events
-            async def handle_my_chat_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
-                await self._handle_chat_member_update(update, bot_id)
-            
-            from telegram.ext import CallbackQueryHandler, ChatMemberHandler
-            application.add_handler(MessageHandler(filters.ALL, handle_message))
-            application.add_handler(CallbackQueryHandler(handle_callback_query))
-            application.add_handler(ChatMemberHandler(handle_my_chat_member, ChatMemberHandler.MY_CHAT_MEMBER))
+            bot = _ManagedBot(
+                token,
+                identity,
+                on_poll=lambda error, updates: self._record_poll(bot_id, error, updates),
+                request=self.requests.api,
+                get_updates_request=self.requests.polling
+            )
+            application = self._build_application(bot_id, bot)
             
             # Start application in background
+            self.polls[bot_id] = (time.monotonic(), None)
+            self.activity[bot_id] = time.monotonic()
             await application.initialize()
             await application.start()
             await application.updater.start_polling()
             
             self.applications[bot_id] = application
-            self.bots[bot_id] = bot
+            self.bots[bot_id] = application.bot
+            self.set_state(bot_id, "running")
             
+            bot_info = application.bot.bot
             return {
                 "id": bot_id,
+                "telegram_id": bot_info.id,
                 "username": bot_info.username,
                 "first_name": bot_info.first_name,
                 "success": True
             }
-        except TelegramError as e:
+        except asyncio.CancelledError:
+            # Shutting down mid-start: don't leave a half-started bot polling
+            self.polls.pop(bot_id, None)
+            if application is not None:
+                await self._teardown(bot_id, application)
+            self.set_state(bot_id, "stopped")
+            raise
+        except Exception as e:
             logger.error(f"Failed to add bot: {e}")
-            raise Exception(f"Invalid token or bot error: {str(e)}")
+            self.polls.pop(bot_id, None)
+            if application is not None:
+                await self._teardown(bot_id, application)
+            if isinstance(e, InvalidToken):
+                await self.quarantine(bot_id, str(e))
+            else:
+                self.set_state(bot_id, "failed", str(e))
+            if isinstance(e, TelegramError):
+                raise Exception(f"Invalid token or bot error: {str(e)}")
+            raise
+    
+    def _build_application(self, bot_id: str, bot: ExtBot) -> Application:
+        """Application for a bot with all update handlers registered"""
+        application = Application.builder().bot(bot).build()
+        
+        # Runs before all other handlers: drops updates Telegram delivered again
+        # and claims the rest, so no update is handled twice across restarts
+        async def claim_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            recent = self.recent_updates.setdefault(bot_id, RecentUpdates(self.dedupe_window))
+            if not recent.add(update.update_id):
+                logger.info(f"Skipping redelivered update {update.update_id} of bot {bot_id}")
+                raise ApplicationHandlerStop
+            claim = await self._claim_update(bot_id, update.update_id)
+            if claim is not None and claim.get("done"):
+                logger.info(f"Skipping already handled update {update.update_id} of bot {bot_id}")
+                raise ApplicationHandlerStop
+            # A claim that was never finished: the last process stopped mid-update
+            context.replay = claim is not None
+        
+        application.add_handler(TypeHandler(Update, claim_update), group=-1)
+        
+        # Add message handler
+        async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            await self._handle_incoming_message(update, bot_id, getattr(context, "replay", False))
+            await self._finish_update(bot_id, update.update_id)
+        
+        # Add callback query handler for button presses
+        async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            await self._handle_button_press(update, bot_id, getattr(context, "replay", False))
+            await self._finish_update(bot_id, update.update_id)
+        
+        # Add my_chat_member handler for bot block/unblock events
+        async def handle_my_chat_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            # Only sets the chat's status, which is safe to repeat
+            await self._handle_chat_member_update(update, bot_id)
+            await self._finish_update(bot_id, update.update_id)
+        
+        from telegram.ext import CallbackQueryHandler, ChatMemberHandler
+        application.add_handler(MessageHandler(filters.ALL, handle_message))
+        application.add_handler(CallbackQueryHandler(handle_callback_query))
+        application.add_handler(ChatMemberHandler(handle_my_chat_member, ChatMemberHandler.MY_CHAT_MEMBER))
+        return application
+    
+    async def _claim_update(self, bot_id: str, update_id: int) -> Optional[dict]:
+        """Record that an update is being handled; returns the earlier claim if there is one"""
+        try:
+            await self.db.processed_updates.insert_one({
+                "bot_id": bot_id,
+                "update_id": update_id,
+                "done": False,
+                "created_at": datetime.now(timezone.utc)
+            })
+            return None
+        except DuplicateKeyError:
+            claim = await self.db.processed_updates.find_one({"bot_id": bot_id, "update_id": update_id})
+            return claim or {}
+    
+    async def _finish_update(self, bot_id: str, update_id: int):
+        await self.db.processed_updates.update_one(
+            {"bot_id": bot_id, "update_id": update_id},
+            {"$set": {"done": True}}
+        )
     
     async def remove_bot(self, bot_id: str):
         """Remove a bot and stop listening"""
         if bot_id in self.applications:
-            app = self.applications[bot_id]
-            await app.updater.stop()
-            await app.stop()
-            await app.shutdown()
-            del self.applications[bot_id]
-            del self.bots[bot_id]
+            app = self.applications.pop(bot_id)
+            await self._teardown(bot_id, app)
+        # A hibernating bot has only its Bot left
+        self.bots.pop(bot_id, None)
+        self.polls.pop(bot_id, None)
+        self.activity.pop(bot_id, None)
+        self.set_state(bot_id, "stopped")
+    
+    async def hibernate(self, bot_id: str):
+        """Drop an idle bot's Application and polling task.
+
+        Its Bot stays in self.bots, so sending keeps working; the shared
+        hibernation poller watches for new updates and calls wake.
+        """
+        application = self.applications.pop(bot_id, None)
+        if application is None:
+            return
+        # Stopping the updater confirms the updates handled so far
+        await self._teardown(bot_id, application)
+        # Shutdown left the shared pools open and the identity cached
+        await application.bot.initialize()
+        self.set_state(bot_id, "hibernating")
+        logger.info(f"Hibernated idle bot {bot_id}")
+    
+    async def wake(self, bot_id: str) -> dict:
+        """Give a hibernating bot a full Application again"""
+        bot = self.bots[bot_id]
+        identity = {"telegram_id": bot.bot.id, "username": bot.bot.username, "first_name": bot.bot.first_name}
+        bot_info = await self.add_bot(bot_id, bot.token, identity)
+        logger.info(f"Woke up bot {bot_id}")
+        return bot_info
     
-    async def _handle_incoming_message(self, update: Update, bot_id: str):
-        """Handle incoming message from user"""
+    async def _teardown(self, bot_id: str, application: Application):
+        """Stop an application, also one whose polling already died"""
+        if application.updater.running:
+            try:
+                await application.updater.stop()
+            except Exception as e:
+                # Stopping re-raises the error that ended polling
+                logger.warning(f"Polling of bot {bot_id} ended with error: {e}")
+        if application.running:
+            await application.stop()
+        await application.shutdown()
+    
+    async def close(self):
+        """Release the shared connection pools once all bots are removed"""
+        await self.requests.close()
+    
+    async def shutdown(self):
+        """Stop all bots for process exit.
+
+        Polling stops first everywhere, so no new updates come in; stopping
+        PTB's updater confirms the updates it already fetched to Telegram,
+        which is the only offset kept between runs. Those updates are then
+        handled, for at most shutdown_drain_seconds, before all bots are torn
+        down concurrently. Updates still queued or being handled when that
+        deadline passes are lost: Telegram won't deliver them again.
+        """
+        applications = list(self.applications.items())
+        self.applications.clear()
+        
+        async def stop_polling(bot_id: str, application: Application):
+            if application.updater.running:
+                try:
+                    await application.updater.stop()
+                except Exception as e:
+                    logger.warning(f"Polling of bot {bot_id} ended with error: {e}")
+        
+        await asyncio.gather(*(stop_polling(bot_id, app) for bot_id, app in applications))
+        
+        # Application.stop handles the queued updates and waits for pending tasks
+        drains = [asyncio.create_task(app.stop()) for _, app in applications if app.running]
+        if drains:
+            _, pending = await asyncio.wait(drains, timeout=self.shutdown_drain_seconds)
+            if pending:
+                logger.warning(f"{len(pending)} bots still handling updates after {self.shutdown_drain_seconds}s, giving up")
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+        
+        results = await asyncio.gather(*(app.shutdown() for _, app in applications), return_exceptions=True)
+        for (bot_id, _), result in zip(applications, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to shut down bot {bot_id}: {result}")
+        self.bots.clear()
+        logger.info(f"Stopped {len(applications)} bots")
+    
+    async def quarantine(self, bot_id: str, reason: str):
+        """Stop and deactivate a bot whose token Telegram rejects.
+
+        It stays off until it is toggled on again.
+        """
+        await self.remove_bot(bot_id)
+        self.set_state(bot_id, "quarantined", reason)
+        await self.db.bots.update_one({"id": bot_id}, {"$set": {
+            "is_active": False,
+            "quarantined_at": datetime.now(timezone.utc),
+            "quarantine_reason": reason
+        }})
+        get_config_cache(self.db).invalidate("bots")
+        logger.warning(f"Quarantined bot {bot_id}: {reason}")
+    
+    async def _handle_incoming_message(self, update: Update, bot_id: str, replay: bool = False):
+        """Handle incoming message from user.
+        
+        With `replay` the update was claimed by a process that stopped before
+        finishing it: the message and chat are written again, which is safe to
+        repeat, but nothing is sent to the user a second time.
+        """
         if not update.message:
             return
             
@@ -82,17 +467,43 @@ class TelegramBotManager:
         
         # Проверяем команду /start
         if message.text and message.text.strip().lower() == '/start':
-            await self._send_welcome_message(bot_id, user.id)
+            if not replay:
+                await self._send_welcome_message(bot_id, user.id)
             return
         
         # Check if message is a menu command
         if message.text and message.text.startswith('/'):
             command = message.text[1:].split()[0].lower()  # Remove / and get first word
-            if await self._handle_menu_command(bot_id, user.id, command):
+            if replay:
+                if f"{bot_id}_{command}" in getattr(self, 'command_button_map', {}):
+                    return  # Its actions may have run already
+            elif await self._handle_menu_command(bot_id, user.id, command):
                 return  # Command was handled, don't process as regular message
         
-        # Save or update chat
         chat_id = f"{bot_id}_{user.id}"
+        message_data = {
+            "id": str(uuid.uuid4()),
+            "chat_id": chat_id,
+            "bot_id": bot_id,
+            "user_id": user.id,
+            "text": message.text or "",
+            "file_id": message.document.file_id if message.document else (message.photo[-1].file_id if message.photo else None),
+            "file_type": "document" if message.document else ("photo" if message.photo else None),
+            "telegram_chat_id": message.chat.id,
+            "telegram_message_id": message.message_id,
+            "is_from_bot": False,
+            "created_at": datetime.now(timezone.utc)
+        }
+        try:
+            await self.db.messages.insert_one(message_data)
+            get_resource_versions().bump("messages", chat_id)
+        except DuplicateKeyError:
+            # Stored before the last process stopped; the chat may still need updating
+            logger.info(f"Message {message.message_id} in chat {chat_id} is already stored")
+            replay = True
+        
+        # Save or update chat. counted_message_ids holds the last incoming message
+        # counted in unread_count per Telegram chat, so each message is counted once.
         chat_data = {
             "id": chat_id,
             "bot_id": bot_id,
@@ -100,43 +511,45 @@ class TelegramBotManager:
             "username": user.username or "",
             "first_name": user.first_name or "",
             "last_name": user.last_name or "",
+            "search_terms": search_terms(user.username, user.first_name, user.last_name),
+            "search_terms_version": SEARCH_TERMS_VERSION,
             "last_message": message.text or "[File]",
             "last_message_time": datetime.now(timezone.utc),
             "updated_at": datetime.now(timezone.utc)
         }
         
+        chat_counts = get_chat_counts(self.db)
         existing_chat = await self.db.chats.find_one({"id": chat_id})
+        telegram_chat_id = str(message.chat.id)
+        counted = (existing_chat or {}).get("counted_message_ids") or {}
+        if counted.get(telegram_chat_id, 0) >= message.message_id:
+            logger.info(f"Chat {chat_id} already counts message {message.message_id} of {telegram_chat_id}")
+            return
         if existing_chat:
             await self.db.chats.update_one(
                 {"id": chat_id},
                 {
-                    "$set": chat_data,
+                    "$set": {**chat_data, f"counted_message_ids.{telegram_chat_id}": message.message_id},
                     "$inc": {"unread_count": 1}
                 }
             )
+            chat_counts.apply_change(existing_chat, {
+                **existing_chat,
+                "unread_count": existing_chat.get("unread_count", 0) + 1
+            })
         else:
             chat_data["unread_count"] = 1
+            chat_data["counted_message_ids"] = {telegram_chat_id: message.message_id}
             chat_data["created_at"] = datetime.now(timezone.utc)
             await self.db.chats.insert_one(chat_data)
-        
-        # Save message
-        message_data = {
-            "id": str(uuid.uuid4()),
-            "chat_id": chat_id,
-            "bot_id": bot_id,
-            "user_id": user.id,
-            "text": message.text or "",
-            "file_id": message.document.file_id if message.document else (message.photo[-1].file_id if message.photo else None),
-            "file_type": "document" if message.document else ("photo" if message.photo else None),
-            "telegram_message_id": message.message_id,
-            "is_from_bot": False,
-            "is_read": False,
-            "created_at": datetime.now(timezone.utc)
-        }
-        await self.db.messages.insert_one(message_data)
+            chat_counts.apply_change(None, chat_data)
+        get_resource_versions().bump("chats", bot_id)
+        get_typeahead_index(self.db).update(
+            chat_id, bot_id, chat_data["username"], chat_data["first_name"], chat_data["last_name"]
+        )
         
         # Check for auto-replies
-        if message.text:
+        if message.text and not replay:
             await self._check_auto_reply(bot_id, user.id, message.text)
     
     async def send_message(self, bot_id: str, user_id: int, text: str, file_id: Optional[str] = None, reply_to_message_id: Optional[int] = None) -> dict:
@@ -170,9 +583,9 @@ class TelegramBotManager:
                 "user_id": user_id,
                 "text": text,
                 "file_id": file_id,
+                "telegram_chat_id": user_id,
                 "telegram_message_id": sent_message.message_id,
                 "is_from_bot": True,
-                "is_read": True,
                 "created_at": datetime.now(timezone.utc)
             }
             await self.db.messages.insert_one(message_data)
@@ -188,6 +601,9 @@ class TelegramBotManager:
                     }
                 }
             )
+            versions = get_resource_versions()
+            versions.bump("messages", chat_id)
+            versions.bump("chats", bot_id)
             
             return message_data
         except TelegramError as e:
@@ -253,10 +669,10 @@ class TelegramBotManager:
                 "file_id": sent_message.document.file_id,
                 "file_type": "document",
                 "is_from_bot": True,
-                "is_read": True,
                 "created_at": datetime.now(timezone.utc)
             }
             await self.db.messages.insert_one(message_data)
+            get_resource_versions().bump("messages", chat_id)
             
             return message_data
         except Exception as e:
@@ -304,7 +720,10 @@ class TelegramBotManager:
     async def _check_auto_reply(self, bot_id: str, user_id: int, text: str):
         """Check if message triggers auto-reply"""
         # Get active auto-replies
-        auto_replies = await self.db.auto_replies.find({"is_active": True}).to_list(100)
+        auto_replies = [
+            reply for reply in await get_config_cache(self.db).get("auto_replies")
+            if reply.get("is_active")
+        ]
         
         # Normalize text
         text_lower = text.lower()
@@ -473,11 +892,28 @@ class TelegramBotManager:
             import traceback
             traceback.print_exc()
 
-    async def _handle_button_press(self, update: Update, bot_id: str):
+    async def _add_chat_label(self, chat_id: str, label_id: str):
+        """Add label to chat and update sidebar counts"""
+        before = await self.db.chats.find_one_and_update(
+            {"id": chat_id},
+            {"$addToSet": {"label_ids": label_id}},
+            projection=COUNTED_FIELDS,
+            return_document=ReturnDocument.BEFORE
+        )
+        if before and label_id not in (before.get("label_ids") or []):
+            after = {**before, "label_ids": (before.get("label_ids") or []) + [label_id]}
+            get_chat_counts(self.db).apply_change(before, after)
+            get_resource_versions().bump("chats", before["bot_id"])
+
+    async def _handle_button_press(self, update: Update, bot_id: str, replay: bool = False):
         """Handle button press from inline keyboard (for block actions)"""
         query = update.callback_query
         if not query:
             return
+        if replay:
+            # The actions may have run already and the query is too old to answer
+            logger.info(f"Not repeating button press {query.data} of bot {bot_id}")
+            return
         
         await query.answer()
         
@@ -522,10 +958,7 @@ class TelegramBotManager:
                     # Add label to chat
                     label_id = action_value.get("label_id")
                     if label_id:
-                        await self.db.chats.update_one(
-                            {"id": chat_id},
-                            {"$addToSet": {"label_ids": label_id}}
-                        )
+                        await self._add_chat_label(chat_id, label_id)
                         logger.info(f"Label {label_id} added to chat {chat_id}")
                 
                 elif action_type == "block" and action_value:
@@ -605,10 +1038,7 @@ class TelegramBotManager:
                     # Add label to chat
                     label_id = action_value.get("label_id")
                     if label_id:
-                        await self.db.chats.update_one(
-                            {"id": chat_id},
-                            {"$addToSet": {"label_ids": label_id}}
-                        )
+                        await self._add_chat_label(chat_id, label_id)
                         logger.info(f"Label {label_id} added to chat {chat_id}")
                 
                 elif action_type == "block" and action_value:
@@ -693,10 +1123,7 @@ class TelegramBotManager:
                     # Add label to chat
                     label_id = action_value.get("label_id")
                     if label_id:
-                        await self.db.chats.update_one(
-                            {"id": chat_id},
-                            {"$addToSet": {"label_ids": label_id}}
-                        )
+                        await self._add_chat_label(chat_id, label_id)
                         logger.info(f"Label {label_id} added to chat {chat_id}")
                 
                 elif action_type == "block" and action_value:
@@ -771,17 +1198,22 @@ class TelegramBotManager:
             
             # Update chat status in database
             chat_id = f"{bot_id}_{user.id}"
-            result = await self.db.chats.update_one(
+            before = await self.db.chats.find_one_and_update(
                 {"id": chat_id},
                 {
                     "$set": {
                         "bot_status": bot_status,
                         "updated_at": datetime.now(timezone.utc).isoformat()
                     }
-                }
+                },
+                projection=COUNTED_FIELDS,
+                return_document=ReturnDocument.BEFORE
             )
             
-            if result.modified_count > 0:
+            if before:
+                get_chat_counts(self.db).apply_change(before, {**before, "bot_status": bot_status})
+                get_resource_versions().bump("chats", bot_id)
+
                 # Import and call broadcast function
                 from server import broadcast_chat_status
                 await broadcast_chat_status(chat_id, bot_status)
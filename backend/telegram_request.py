@@ -0,0 +1,75 @@
+import importlib.util
+import logging
+import os
+from typing import Optional
+
+import httpx
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+
+class SharedHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest whose connection pool is used by all bots.
+
+    PTB initializes and shuts down a bot's request objects together with the
+    bot, so shutdown is a no-op here: one bot stopping must not close the
+    pool under the others. `close` releases the pool when the process stops.
+    """
+
+    async def shutdown(self):
+        pass
+
+    async def close(self):
+        await super().shutdown()
+
+
+def http_version() -> str:
+    """HTTP/2 when the h2 package is installed and not disabled, else HTTP/1.1"""
+    if os.environ.get("TELEGRAM_HTTP2", "1") == "0" or importlib.util.find_spec("h2") is None:
+        return "1.1"
+    return "2"
+
+
+def build_request(max_connections: int, pool_timeout: Optional[float], read_timeout: Optional[float]) -> SharedHTTPXRequest:
+    version = http_version()
+    return SharedHTTPXRequest(
+        read_timeout=read_timeout,
+        pool_timeout=pool_timeout,
+        http_version=version,
+        httpx_kwargs={
+            "limits": httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=float(os.environ.get("TELEGRAM_KEEPALIVE_SECONDS", "60"))
+            )
+        }
+    )
+
+
+class TelegramRequests:
+    """The two shared pools to api.telegram.org.
+
+    Regular API calls and getUpdates get separate pools so long polls, which
+    hold a connection (or an HTTP/2 stream) for their whole timeout, never
+    starve sends. With HTTP/2 many requests share one connection, so the
+    connection count follows concurrency rather than the number of bots.
+    """
+
+    def __init__(self):
+        self.api = build_request(
+            max_connections=int(os.environ.get("TELEGRAM_POOL_SIZE", "64")),
+            pool_timeout=float(os.environ.get("TELEGRAM_POOL_TIMEOUT_SECONDS", "5")),
+            read_timeout=5.0
+        )
+        # Bots add the long-poll timeout to read_timeout on every getUpdates
+        self.polling = build_request(
+            max_connections=int(os.environ.get("TELEGRAM_POLLING_POOL_SIZE", "512")),
+            pool_timeout=float(os.environ.get("TELEGRAM_POLLING_POOL_TIMEOUT_SECONDS", "30")),
+            read_timeout=5.0
+        )
+        logger.info(f"Telegram requests use HTTP/{self.api.http_version}")
+
+    async def close(self):
+        await self.api.close()
+        await self.polling.close()
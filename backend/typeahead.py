@@ -0,0 +1,157 @@
+import asyncio
+import bisect
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from chat_search import normalize
+
+logger = logging.getLogger(__name__)
+
+
+def _name_keys(username: str, first_name: str, last_name: str) -> Tuple[str, ...]:
+    """Lowercase keys a chat can be found by: username, names and full name"""
+    keys = {
+        normalize(username),
+        normalize(first_name),
+        normalize(last_name),
+        normalize(f"{first_name} {last_name}")
+    }
+    keys.discard("")
+    return tuple(sorted(keys))
+
+
+class TypeaheadIndex:
+    """In-memory prefix index over chat usernames and names.
+
+    Each bot has its own sorted list of (key, chat_id) pairs, so a prefix
+    lookup is one bisect per selected bot followed by a short forward scan.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self._keys: Dict[str, List[Tuple[str, str]]] = {}  # bot_id -> sorted (key, chat_id)
+        # chat_id -> (bot_id, keys, (username, first_name, last_name))
+        self._chats: Dict[str, tuple] = {}
+        self.loaded = False
+        self._loading = False
+        self._pending: List[tuple] = []  # updates received while loading
+        self._load_lock = asyncio.Lock()
+
+    async def ensure_loaded(self):
+        async with self._load_lock:
+            if not self.loaded:
+                await self.load()
+
+    async def load(self):
+        """Build the index from all chats"""
+        self._loading = True
+        try:
+            keys: Dict[str, List[Tuple[str, str]]] = {}
+            chats: Dict[str, tuple] = {}
+            cursor = self.db.chats.find(
+                {}, {"_id": 0, "id": 1, "bot_id": 1, "username": 1, "first_name": 1, "last_name": 1}
+            ).batch_size(5000)
+            async for chat in cursor:
+                names = (chat.get("username") or "", chat.get("first_name") or "", chat.get("last_name") or "")
+                chat_keys = _name_keys(*names)
+                chats[chat["id"]] = (chat["bot_id"], chat_keys, names)
+                bot_keys = keys.setdefault(chat["bot_id"], [])
+                bot_keys.extend((key, chat["id"]) for key in chat_keys)
+            for bot_keys in keys.values():
+                bot_keys.sort()
+        except BaseException:
+            # Pending updates are already in the db, the next load picks them up
+            self._pending = []
+            raise
+        finally:
+            self._loading = False
+        self._keys, self._chats = keys, chats
+        self.loaded = True
+        pending, self._pending = self._pending, []
+        for update in pending:
+            self.update(*update)
+        logger.info(f"Typeahead index loaded: {len(chats)} chats")
+
+    def update(self, chat_id: str, bot_id: str, username: str, first_name: str, last_name: str):
+        """Add a new chat or re-index a renamed one"""
+        if self._loading:
+            self._pending.append((chat_id, bot_id, username, first_name, last_name))
+            return
+        names = (username or "", first_name or "", last_name or "")
+        existing = self._chats.get(chat_id)
+        if existing and existing[2] == names:
+            return
+        if existing:
+            self.remove(chat_id)
+
+        chat_keys = _name_keys(*names)
+        bot_keys = self._keys.setdefault(bot_id, [])
+        for key in chat_keys:
+            bisect.insort(bot_keys, (key, chat_id))
+        self._chats[chat_id] = (bot_id, chat_keys, names)
+
+    def remove(self, chat_id: str):
+        existing = self._chats.pop(chat_id, None)
+        if not existing:
+            return
+        bot_id, chat_keys, _ = existing
+        bot_keys = self._keys.get(bot_id, [])
+        for key in chat_keys:
+            index = bisect.bisect_left(bot_keys, (key, chat_id))
+            if index < len(bot_keys) and bot_keys[index] == (key, chat_id):
+                del bot_keys[index]
+
+    def remove_bot(self, bot_id: str):
+        bot_keys = self._keys.pop(bot_id, [])
+        for _, chat_id in bot_keys:
+            self._chats.pop(chat_id, None)
+
+    def suggest(self, query: str, bot_ids: Optional[Iterable[str]] = None, limit: int = 10) -> List[dict]:
+        """First `limit` chats (by matching key) whose name starts with query"""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+
+        matches = []
+        for bot_id in (bot_ids if bot_ids is not None else list(self._keys.keys())):
+            bot_keys = self._keys.get(bot_id)
+            if not bot_keys:
+                continue
+            index = bisect.bisect_left(bot_keys, (prefix, ""))
+            found = 0
+            # A chat matches by up to 4 keys, so scan enough to get `limit` chats
+            while index < len(bot_keys) and found < limit * 4 and bot_keys[index][0].startswith(prefix):
+                matches.append(bot_keys[index])
+                index += 1
+                found += 1
+        matches.sort()
+
+        result = []
+        seen = set()
+        for _, chat_id in matches:
+            if chat_id in seen:
+                continue
+            seen.add(chat_id)
+            bot_id, _, (username, first_name, last_name) = self._chats[chat_id]
+            result.append({
+                "id": chat_id,
+                "bot_id": bot_id,
+                "username": username,
+                "first_name": first_name,
+                "last_name": last_name
+            })
+            if len(result) >= limit:
+                break
+        return result
+
+
+# Global instance
+typeahead_index: Optional[TypeaheadIndex] = None
+
+def get_typeahead_index(db: AsyncIOMotorDatabase) -> TypeaheadIndex:
+    global typeahead_index
+    if typeahead_index is None:
+        typeahead_index = TypeaheadIndex(db)
+    return typeahead_index
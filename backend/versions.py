@@ -0,0 +1,57 @@
+import hashlib
+import uuid
+from collections import defaultdict
+from typing import Dict, Hashable, Optional, Tuple
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value matches etag"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+class ResourceVersions:
+    """In-process change counters of polled resources.
+
+    Write paths bump a counter per resource key (a bot's chats, a chat's
+    messages) or for the whole resource after bulk writes; readers build
+    ETags from the counters without touching Mongo. Counters live in memory,
+    so a random epoch makes ETags from a previous process never match.
+    """
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex
+        self._whole: Dict[str, int] = defaultdict(int)  # bulk changes of a resource
+        self._any: Dict[str, int] = defaultdict(int)  # any change of a resource
+        self._keys: Dict[Tuple[str, Hashable], int] = defaultdict(int)
+
+    def bump(self, resource: str, key: Optional[Hashable] = None):
+        """Record a change of one key of resource, of all of it if key is None"""
+        self._any[resource] += 1
+        if key is None:
+            self._whole[resource] += 1
+        else:
+            self._keys[(resource, key)] += 1
+
+    def version(self, resource: str, key: Optional[Hashable] = None) -> Tuple[int, ...]:
+        """Version of one key of resource, of all of it if key is None"""
+        if key is None:
+            return (self._any[resource],)
+        return (self._whole[resource], self._keys[(resource, key)])
+
+    def etag(self, *parts) -> str:
+        """Strong ETag for versions and request parameters"""
+        digest = hashlib.blake2b(repr((self.epoch, parts)).encode(), digest_size=12)
+        return f'"{digest.hexdigest()}"'
+
+
+# Global instance
+resource_versions: Optional[ResourceVersions] = None
+
+def get_resource_versions() -> ResourceVersions:
+    global resource_versions
+    if resource_versions is None:
+        resource_versions = ResourceVersions()
+    return resource_versions
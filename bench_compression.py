@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Wire size benchmark for the chat list endpoint
+Encodes the same chat list as JSON and MessagePack, each uncompressed, gzip
+and brotli, and reports bytes on the wire and CPU time of encoding plus
+compression, to pick a tradeoff for operators on slow links.
+
+Usage: python bench_compression.py [chats] [rounds]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import orjson
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+from bench_serialization import make_chats  # noqa: E402
+from compression import brotli, compress  # noqa: E402
+from models import Chat  # noqa: E402
+from serialization import CHAT_DEFAULTS, MsgpackResponse, select_fields, lean_documents  # noqa: E402
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+
+def encoders():
+    yield "json", lambda docs: orjson.dumps(docs)
+    yield "msgpack", lambda docs: MsgpackResponse(docs).body
+
+
+def compressors():
+    yield "identity", lambda body: body
+    yield f"gzip-{GZIP_LEVEL}", lambda body: compress(body, "gzip", GZIP_LEVEL, BROTLI_QUALITY)
+    if brotli is not None:
+        yield f"br-{BROTLI_QUALITY}", lambda body: compress(body, "br", GZIP_LEVEL, BROTLI_QUALITY)
+
+
+def measure(func, rounds):
+    best = None
+    result = None
+    for _ in range(rounds):
+        start = time.process_time()
+        result = func()
+        elapsed = time.process_time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    field_names = select_fields(Chat, None)
+    chats = make_chats(count)
+    projected = [{k: v for k, v in chat.items() if k in field_names} for chat in chats]
+    docs = lean_documents(projected, field_names, CHAT_DEFAULTS)
+
+    print(f"{count} chats, best of {rounds} rounds")
+    print(f"{'encoding':<20}{'bytes':>10}{'ratio':>8}{'CPU ms':>10}")
+    baseline = None
+    for encoder_name, encode in encoders():
+        for compressor_name, compress_body in compressors():
+            cpu, body = measure(lambda: compress_body(encode(docs)), rounds)
+            baseline = baseline or len(body)
+            name = f"{encoder_name}+{compressor_name}"
+            print(f"{name:<20}{len(body):>10}{len(body) / baseline:>8.2f}{cpu * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
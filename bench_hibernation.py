@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for idle-bot hibernation
+Starts bots against an offline stand-in for the Bot API, once as full
+Applications with long polling and once hibernated (started, then parked
+one after another), and reports the RSS each mode adds per 100 bots. Each
+mode runs in a fresh process so the numbers don't share an allocator.
+
+Usage: python bench_hibernation.py [bots]
+"""
+
+import asyncio
+import gc
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "bench")
+
+from telegram.request import BaseRequest  # noqa: E402
+
+from telegram_manager import TelegramBotManager  # noqa: E402
+
+
+class OfflineRequest(BaseRequest):
+    """Answers every call locally; getUpdates long-polls and returns nothing"""
+
+    @property
+    def read_timeout(self):
+        return 5.0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        if url.endswith("/getUpdates"):
+            await asyncio.sleep(request_data.parameters.get("timeout") or 0)
+            return 200, b'{"ok": true, "result": []}'
+        return 200, b'{"ok": true, "result": true}'
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+async def measure(mode: str, count: int) -> int:
+    manager = TelegramBotManager(db=None)
+    manager.requests.api = manager.requests.polling = OfflineRequest()
+    gc.collect()
+    before = rss_bytes()
+    for i in range(count):
+        bot_id = f"bot{i}"
+        identity = {"telegram_id": 1000 + i, "username": f"bench{i}_bot", "first_name": f"Bench {i}"}
+        await manager.add_bot(bot_id, f"{1000 + i}:{'x' * 35}", identity)
+        if mode == "hibernated":
+            await manager.hibernate(bot_id)
+    # Let polling tasks settle into their long polls
+    await asyncio.sleep(1)
+    gc.collect()
+    return rss_bytes() - before
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "--mode":
+        mode, count = sys.argv[2], int(sys.argv[3])
+        print(json.dumps({"mode": mode, "rss": asyncio.run(measure(mode, count))}))
+        os._exit(0)  # skip tearing down the bots
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    print(f"{count} bots")
+    print(f"{'mode':<12}{'RSS added':>14}{'per 100 bots':>16}")
+    for mode in ("full", "hibernated"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, str(count)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        rss = json.loads(output.strip().splitlines()[-1])["rss"]
+        print(f"{mode:<12}{rss / 2**20:>11.1f} MB{rss / count * 100 / 2**20:>13.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark for the chat list endpoint
+Compares CPU time per 1000 chats of the pydantic path (model per row, then
+response_model validation and JSON encoding) with the lean path (projected
+raw documents encoded by orjson).
+
+Usage: python bench_serialization.py [chats] [rounds]
+"""
+
+import json
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+import orjson
+from pydantic import TypeAdapter
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+from models import Chat  # noqa: E402
+from chat_search import search_terms  # noqa: E402
+from serialization import CHAT_DEFAULTS, select_fields, lean_documents  # noqa: E402
+
+
+def make_chats(count):
+    """Chat documents shaped like the ones stored in Mongo"""
+    now = datetime.utcnow()
+    chats = []
+    for i in range(count):
+        first_name, last_name, username = f"Иван{i}", f"Петров{i}", f"user_{i}"
+        chats.append({
+            "id": str(uuid.uuid4()),
+            "bot_id": str(uuid.uuid4()),
+            "user_id": 100000 + i,
+            "username": username,
+            "first_name": first_name,
+            "last_name": last_name,
+            "last_message": "Здравствуйте, подскажите пожалуйста по заказу " * 2,
+            "last_message_time": now - timedelta(minutes=i),
+            "unread_count": i % 5,
+            "label_ids": [str(uuid.uuid4())] if i % 3 == 0 else [],
+            "bot_status": "active",
+            "search_terms": search_terms(username, first_name, last_name),
+            "created_at": now - timedelta(days=30),
+            "updated_at": now
+        })
+    return chats
+
+
+def pydantic_path(chats):
+    adapter = TypeAdapter(List[Chat])
+    models = [Chat(**chat) for chat in chats]
+    # What FastAPI does with the returned models and response_model
+    content = adapter.validate_python([model.model_dump() for model in models])
+    return json.dumps(
+        adapter.dump_python(content, mode="json"), ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def lean_path(chats):
+    field_names = select_fields(Chat, None)
+    # Mongo applies the projection server side; strip search_terms here to match
+    projected = [{k: v for k, v in chat.items() if k in field_names} for chat in chats]
+    return orjson.dumps(lean_documents(projected, field_names, CHAT_DEFAULTS))
+
+
+def measure(func, chats, rounds):
+    best = None
+    size = 0
+    for _ in range(rounds):
+        start = time.process_time()
+        size = len(func(chats))
+        elapsed = time.process_time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    chats = make_chats(count)
+
+    print(f"Serializing {count} chats, best of {rounds} rounds")
+    results = {}
+    for name, func in (("pydantic", pydantic_path), ("lean", lean_path)):
+        cpu, size = measure(func, chats, rounds)
+        results[name] = cpu
+        print(f"{name:>9}: {cpu / count * 1000 * 1000:8.2f} ms CPU per 1000 chats, {size} bytes")
+    print(f"  speedup: {results['pydantic'] / results['lean']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
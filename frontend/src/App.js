@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import axios from 'axios';
 import { io } from 'socket.io-client';
 import './App.css';
@@ -32,11 +32,10 @@ function App() {
   const [showUsersModal, setShowUsersModal] = useState(false);
   const [mobileTab, setMobileTab] = useState('chats'); // chats, statistics, users, broadcast
   const [isMobile, setIsMobile] = useState(false);
+  const [bootstrap, setBootstrap] = useState(null);
+  const skipChatsLoad = useRef(false);
 
   useEffect(() => {
-    loadBots();
-    loadStats();
-    
     // Detect mobile device
     const checkMobile = () => {
       setIsMobile(window.innerWidth <= 768);
@@ -75,26 +74,56 @@ function App() {
     };
   }, []);
 
+  // Load the inbox once the user (and its access token) is known
+  useEffect(() => {
+    if (user) {
+      loadBootstrap();
+    }
+  }, [user]);
+
   useEffect(() => {
     console.log('useEffect triggered:', { selectedBots, searchQuery, filterType, filterLabelId });
-    loadChats();
+    if (!bootstrap) {
+      return;
+    }
+    if (skipChatsLoad.current) {
+      // Chats of the initial selection came with the bootstrap payload
+      skipChatsLoad.current = false;
+    } else {
+      loadChats();
+    }
     // Автообновление каждые 10 секунд (увеличено для отладки)
     const interval = setInterval(() => {
       loadChats();
       loadStats();
     }, 10000);
     return () => clearInterval(interval);
-  }, [selectedBots, searchQuery, filterType, filterLabelId]);
+  }, [selectedBots, searchQuery, filterType, filterLabelId, bootstrap]);
+
+  const loadBootstrap = async () => {
+    try {
+      // Bots, labels, stats, counts and the first chats in one request
+      const response = await axios.get(`${API}/inbox/bootstrap`);
+      const data = response.data;
+      setBots(data.bots);
+      setStats(data.stats);
+      setChats(data.chats);
+      setSelectedBots(data.selected_bot_ids);
+      skipChatsLoad.current = true;
+      setBootstrap(data);
+    } catch (error) {
+      console.error('Failed to load inbox:', error);
+      setBootstrap({});
+      loadBots();
+      loadStats();
+    }
+  };
 
   const loadBots = async () => {
     try {
       const response = await axios.get(`${API}/bots`);
-      let botsData = response.data;
-      
-      // Фильтровать ботов на основе прав пользователя
-      if (user && user.role === 'user' && user.bot_ids.length > 0) {
-        botsData = botsData.filter(bot => user.bot_ids.includes(bot.id));
-      }
+      // Сервер возвращает только ботов, доступных пользователю
+      const botsData = response.data;
       
       setBots(botsData);
       
@@ -365,6 +394,7 @@ function App() {
                   onFilterChange={handleFilterChange}
                   userRole={user?.role}
                   isMobile={true}
+                  bootstrap={bootstrap}
                 />
               </div>
             )}
@@ -400,6 +430,7 @@ function App() {
                     onChatsUpdate={loadChats}
                     onFilterChange={handleFilterChange}
                     userRole={user?.role}
+                    bootstrap={bootstrap}
                   />
                 </div>
 
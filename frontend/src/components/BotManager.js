@@ -10,22 +10,75 @@ function BotManager({ bots, onClose, onBotAdded, onBotDeleted, embedded = false
   const [token, setToken] = useState('');
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
+  const [progress, setProgress] = useState(null);
+
+  // Several tokens go through the bulk import, which streams one JSON line per token
+  const importBots = async (tokens) => {
+    const response = await fetch(`${API}/bots/import`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        Authorization: `Bearer ${localStorage.getItem('access_token')}`
+      },
+      body: JSON.stringify({ tokens })
+    });
+    if (!response.ok) {
+      const data = await response.json().catch(() => ({}));
+      throw new Error(data.detail || 'Не удалось импортировать ботов');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    const failed = [];
+    let done = 0;
+    let buffer = '';
+    for (;;) {
+      const { value, done: finished } = await reader.read();
+      if (finished) break;
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop();
+      for (const line of lines.filter(Boolean)) {
+        const result = JSON.parse(line);
+        if (result.done) {
+          if (result.error) throw new Error(result.error);
+          continue;
+        }
+        done += 1;
+        if (result.status !== 'added') {
+          failed.push(`#${result.index + 1}: ${result.error}`);
+        }
+        setProgress({ done, total: tokens.length });
+      }
+    }
+    return failed;
+  };
 
   const handleAddBot = async (e) => {
     e.preventDefault();
-    if (!token.trim()) return;
+    const tokens = token.split(/\s+/).filter(Boolean);
+    if (tokens.length === 0) return;
 
     setLoading(true);
     setError('');
 
     try {
-      await axios.post(`${API}/bots`, { token });
+      if (tokens.length === 1) {
+        await axios.post(`${API}/bots`, { token: tokens[0] });
+      } else {
+        setProgress({ done: 0, total: tokens.length });
+        const failed = await importBots(tokens);
+        if (failed.length > 0) {
+          setError(`Не удалось добавить ${failed.length} из ${tokens.length}: ${failed.join('; ')}`);
+        }
+      }
       setToken('');
       onBotAdded();
     } catch (err) {
-      setError(err.response?.data?.detail || 'Не удалось добавить бота');
+      setError(err.response?.data?.detail || err.message || 'Не удалось добавить бота');
     } finally {
       setLoading(false);
+      setProgress(null);
     }
   };
 
@@ -53,11 +106,11 @@ function BotManager({ bots, onClose, onBotAdded, onBotDeleted, embedded = false
           {/* Add Bot Form */}
           <form onSubmit={handleAddBot} className="add-bot-form">
             <h3>Добавить нового бота</h3>
-            <input
-              type="text"
+            <textarea
               value={token}
               onChange={(e) => setToken(e.target.value)}
-              placeholder="Вставьте токен бота (от @BotFather)"
+              placeholder="Вставьте токен бота (от @BotFather), несколько токенов — по одному на строку"
+              rows={3}
               disabled={loading}
               data-testid="bot-token-input"
             />
@@ -68,7 +121,9 @@ function BotManager({ bots, onClose, onBotAdded, onBotDeleted, embedded = false
               disabled={loading || !token.trim()}
               data-testid="add-bot-button"
             >
-              <FiPlus /> {loading ? 'Добавление...' : 'Добавить бота'}
+              <FiPlus /> {progress
+                ? `Добавление... ${progress.done}/${progress.total}`
+                : loading ? 'Добавление...' : 'Добавить бота'}
             </button>
           </form>
 
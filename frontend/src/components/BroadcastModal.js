@@ -5,6 +5,7 @@ import './BroadcastModal.css';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+const BATCH_SIZE = 50;
 
 function BroadcastModal({ bots, onClose, onSuccess }) {
   const [selectedBots, setSelectedBots] = useState([]);
@@ -127,18 +128,30 @@ function BroadcastModal({ bots, onClose, onSuccess }) {
         return;
       }
 
-      // Отправка по одному
-      for (const chat of uniqueFilteredChats) {
+      // Отправка пачками: один запрос на BATCH_SIZE чатов
+      for (let i = 0; i < total; i += BATCH_SIZE) {
+        const chunk = uniqueFilteredChats.slice(i, i + BATCH_SIZE);
         try {
-          await axios.post(`${API}/messages`, {
-            bot_id: chat.bot_id,
-            user_id: chat.user_id,
-            text: message
+          const response = await axios.post(`${API}/batch`, {
+            operations: chunk.map(chat => ({
+              method: 'POST',
+              path: '/messages',
+              body: { bot_id: chat.bot_id, user_id: chat.user_id, text: message }
+            }))
+          });
+          response.data.results.forEach((result, index) => {
+            const chat = chunk[index];
+            if (result.status < 400) {
+              sent++;
+              statuses.push({ chat: chat.first_name || chat.username, success: true });
+            } else {
+              statuses.push({ chat: chat.first_name || chat.username, success: false, error: result.body?.detail });
+            }
           });
-          sent++;
-          statuses.push({ chat: chat.first_name || chat.username, success: true });
         } catch (error) {
-          statuses.push({ chat: chat.first_name || chat.username, success: false, error: error.message });
+          chunk.forEach(chat => {
+            statuses.push({ chat: chat.first_name || chat.username, success: false, error: error.message });
+          });
         }
         setProgress({ sent, total, percent: Math.round((sent / total) * 100), statuses });
       }
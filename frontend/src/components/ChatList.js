@@ -6,6 +6,7 @@ import './ChatList.css';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+const BATCH_SIZE = 50;
 
 function ChatList({ 
   chats, 
@@ -19,7 +20,8 @@ function ChatList({
   onChatsUpdate,
   onFilterChange,
   userRole,
-  isMobile
+  isMobile,
+  bootstrap
 }) {
   const isAdmin = userRole === 'admin';
   const [selectedChats, setSelectedChats] = useState([]);
@@ -33,10 +35,24 @@ function ChatList({
   const [saleAmount, setSaleAmount] = useState('');
   const [showExportMenu, setShowExportMenu] = useState(false);
   const [removeSale, setRemoveSale] = useState(false);
+  const [facets, setFacets] = useState(null);
 
+  // Initial labels and counts come with the inbox bootstrap payload
   useEffect(() => {
-    loadLabels();
-  }, []);
+    if (bootstrap?.labels) {
+      setLabels(bootstrap.labels);
+    } else if (bootstrap) {
+      loadLabels();
+    }
+  }, [bootstrap]);
+
+  useEffect(() => {
+    if (bootstrap?.facets && bootstrap.chats === chats) {
+      setFacets(bootstrap.facets);
+    } else if (bootstrap) {
+      loadFacets();
+    }
+  }, [selectedBots, chats, bootstrap]);
 
   const loadLabels = async () => {
     try {
@@ -47,8 +63,29 @@ function ChatList({
     }
   };
 
+  const loadFacets = async () => {
+    try {
+      const params = {};
+      if (selectedBots.length > 0) {
+        params.bot_ids = selectedBots.join(',');
+      }
+      const response = await axios.get(`${API}/chats/facets`, { params });
+      setFacets(response.data);
+    } catch (error) {
+      console.error('Failed to load chat counts:', error);
+    }
+  };
+
   // Count chats matching a specific filter
   const countChatsForFilter = (filterType, labelId = null) => {
+    // Server-side counts cover all chats, not only the loaded page
+    if (facets) {
+      if (filterType === 'unread') return facets.unread_chats;
+      if (filterType === 'label' && labelId) return facets.by_label[labelId] || 0;
+      if (filterType === 'online') return facets.total_chats - (facets.by_bot_status.blocked || 0);
+      if (filterType === 'offline') return facets.by_bot_status.blocked || 0;
+      return 0;
+    }
     if (filterType === 'unread') {
       return chats.filter(chat => chat.unread_count > 0).length;
     } else if (filterType === 'label' && labelId) {
@@ -742,16 +779,26 @@ function BroadcastToSelectedModal({ selectedChats, bots, onClose, onSent }) {
     const total = selectedChats.length;
     let sent = 0;
 
-    for (const chat of selectedChats) {
+    // Send in batches: one request per BATCH_SIZE chats
+    for (let i = 0; i < total; i += BATCH_SIZE) {
+      const chunk = selectedChats.slice(i, i + BATCH_SIZE);
       try {
-        await axios.post(`${API}/messages`, {
-          bot_id: selectedBotId,
-          user_id: chat.user_id,
-          text: message
+        const response = await axios.post(`${API}/batch`, {
+          operations: chunk.map(chat => ({
+            method: 'POST',
+            path: '/messages',
+            body: { bot_id: selectedBotId, user_id: chat.user_id, text: message }
+          }))
+        });
+        response.data.results.forEach((result, index) => {
+          if (result.status < 400) {
+            sent++;
+          } else {
+            console.error(`Failed to send to ${chunk[index].user_id}:`, result.body);
+          }
         });
-        sent++;
       } catch (error) {
-        console.error(`Failed to send to ${chat.user_id}:`, error);
+        console.error('Failed to send batch:', error);
       }
       setProgress({ sent, total, percent: Math.round((sent / total) * 100) });
     }
@@ -66,7 +66,7 @@ function ChatView({ chat, onMessageSent, onBack, isMobile }) {
 
   const markAsRead = async () => {
     try {
-      await axios.patch(`${API}/messages/read`, { chat_id: chat.id });
+      await axios.patch(`${API}/chats/${chat.id}/read`);
       onMessageSent();
     } catch (error) {
       console.error('Failed to mark as read:', error);
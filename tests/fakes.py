@@ -0,0 +1,85 @@
+"""In-memory stand-ins for the Motor database used by the tests"""
+
+from pymongo.errors import DuplicateKeyError
+
+
+def _matches(doc, query):
+    for field, condition in query.items():
+        if isinstance(condition, dict) and "$in" in condition:
+            if doc.get(field) not in condition["$in"]:
+                return False
+        elif isinstance(condition, dict) and "$ne" in condition:
+            if doc.get(field) == condition["$ne"]:
+                return False
+        elif doc.get(field) != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return list(self.docs)
+
+
+class FakeCollection:
+    """Collection with just enough of Motor's API for the tests; records every query"""
+
+    def __init__(self, docs=None, unique_keys=None):
+        self.docs = [dict(doc) for doc in docs or []]
+        self.unique_keys = unique_keys
+        self.queries = []
+
+    def _find(self, query):
+        return next((doc for doc in self.docs if _matches(doc, query or {})), None)
+
+    def find(self, query=None, projection=None):
+        self.queries.append(query)
+        return FakeCursor([dict(doc) for doc in self.docs if _matches(doc, query or {})])
+
+    async def find_one(self, query=None, projection=None):
+        self.queries.append(query)
+        doc = self._find(query)
+        return dict(doc) if doc else None
+
+    async def insert_one(self, doc):
+        if self.unique_keys:
+            key = tuple(doc.get(field) for field in self.unique_keys)
+            if any(tuple(other.get(field) for field in self.unique_keys) == key for other in self.docs):
+                raise DuplicateKeyError("duplicate key")
+        self.docs.append(dict(doc))
+
+    async def update_one(self, query, update):
+        doc = self._find(query)
+        if doc:
+            for path, value in update.get("$set", {}).items():
+                *parents, field = path.split(".")
+                target = doc
+                for parent in parents:
+                    target = target.setdefault(parent, {})
+                target[field] = value
+            for field, amount in update.get("$inc", {}).items():
+                doc[field] = doc.get(field, 0) + amount
+
+
+class FakeDb:
+    """Database of FakeCollections, created on first access.
+
+    `unique` maps collection names to the fields of their unique index.
+    """
+
+    def __init__(self, unique=None, **collections):
+        self.unique = unique or {}
+        self.collections = {
+            name: FakeCollection(docs, self.unique.get(name)) for name, docs in collections.items()
+        }
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return self.collections.setdefault(name, FakeCollection(unique_keys=self.unique.get(name)))
+
+    def query_count(self):
+        return sum(len(collection.queries) for collection in self.collections.values())
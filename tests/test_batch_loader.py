@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+import server
+from batch_loader import BatchLoader, RequestLoaders
+from tests.fakes import FakeDb
+
+
+def _menu_db(rows):
+    return FakeDb(
+        bot_menus=[{"id": f"menu{i}", "name": f"Menu {i}"} for i in range(rows)],
+        bot_menu_assignments=[{"bot_id": f"bot{i}", "menu_id": f"menu{i}"} for i in range(rows)]
+    )
+
+
+def _sales_db(rows):
+    return FakeDb(
+        bots=[{"id": f"bot{i}", "username": f"bot_{i}"} for i in range(rows)],
+        chats=[
+            {"id": f"chat{i}", "bot_id": f"bot{i}", "sale_amount": 10.0, "sale_date": "2025-01-01T10:00:00"}
+            for i in range(rows)
+        ]
+    )
+
+
+def _bot_menu_assignments_queries(monkeypatch, rows):
+    fake_db = _menu_db(rows)
+    monkeypatch.setattr(server, "db", fake_db)
+    result = asyncio.run(server.get_bot_menu_assignments(loaders=RequestLoaders(fake_db)))
+    assert [item["menu_name"] for item in result] == [f"Menu {i}" for i in range(rows)]
+    return fake_db.query_count()
+
+
+def _sales_statistics_queries(monkeypatch, rows):
+    fake_db = _sales_db(rows)
+    monkeypatch.setattr(server, "db", fake_db)
+    result = asyncio.run(server.get_sales_statistics(loaders=RequestLoaders(fake_db)))
+    assert result.total_buyers == rows
+    assert {item["bot_username"] for item in result.sales_by_bot} == {f"bot_{i}" for i in range(rows)}
+    return fake_db.query_count()
+
+
+def test_bot_menu_assignments_query_count_is_constant(monkeypatch):
+    assert _bot_menu_assignments_queries(monkeypatch, 3) == 2
+    assert _bot_menu_assignments_queries(monkeypatch, 300) == 2
+
+
+def test_sales_statistics_query_count_is_constant(monkeypatch):
+    assert _sales_statistics_queries(monkeypatch, 3) == 2
+    assert _sales_statistics_queries(monkeypatch, 300) == 2
+
+
+def test_loader_batches_and_deduplicates_keys():
+    fake_db = FakeDb(bots=[{"id": "a"}, {"id": "b"}])
+    loader = BatchLoader(fake_db.bots)
+
+    async def load():
+        first = await asyncio.gather(loader.load("a"), loader.load("b"), loader.load("a"), loader.load("missing"))
+        second = await loader.load("b")
+        return first, second
+
+    first, second = asyncio.run(load())
+    assert first == [{"id": "a"}, {"id": "b"}, {"id": "a"}, None]
+    assert second == {"id": "b"}
+    assert fake_db.bots.queries == [{"id": {"$in": ["a", "b", "missing"]}}]
+
+
+def test_loader_propagates_errors():
+    class FailingCollection:
+        def find(self, query, projection):
+            raise RuntimeError("boom")
+
+    async def load():
+        return await BatchLoader(FailingCollection()).load("a")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(load())
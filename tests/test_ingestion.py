@@ -0,0 +1,162 @@
+import asyncio
+
+from telegram import Update
+
+from telegram_manager import RecentUpdates, TelegramBotManager, _ManagedBot
+from tests.fakes import FakeDb
+
+BOT_ID = "bot1"
+IDENTITY = {"telegram_id": 1000, "username": "replay_bot", "first_name": "Replay"}
+
+
+def _db(unique_index=True):
+    # Mirrors the unique indexes from TelegramBotManager.ensure_indexes
+    return FakeDb(unique={
+        "messages": ("chat_id", "telegram_chat_id", "telegram_message_id", "is_from_bot"),
+        "processed_updates": ("bot_id", "update_id")
+    } if unique_index else None)
+
+
+def _update(bot, update_id, message_id, text="hello", chat=None):
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": message_id,
+            "date": 1700000000,
+            "chat": chat or {"id": 42, "type": "private"},
+            "from": {"id": 42, "is_bot": False, "first_name": "Ann", "username": "ann"},
+            "text": text
+        }
+    }, bot)
+
+
+def _manager(db):
+    manager = TelegramBotManager(db)
+    sent = []
+
+    async def check_auto_reply(bot_id, user_id, text):
+        sent.append(text)
+
+    async def send_welcome_message(bot_id, user_id):
+        sent.append("/start")
+
+    manager._check_auto_reply = check_auto_reply
+    manager._send_welcome_message = send_welcome_message
+    return manager, sent
+
+
+async def _replay(manager, updates_per_run):
+    """Feed each run of updates through a freshly built application"""
+    for updates in updates_per_run:
+        bot = _ManagedBot("1000:" + "x" * 35, IDENTITY)
+        application = manager._build_application(BOT_ID, bot)
+        await application.initialize()
+        for update_id, message_id, *text in updates:
+            await application.process_update(_update(bot, update_id, message_id, *text))
+        await application.shutdown()
+
+
+def test_redelivered_updates_are_dropped_before_any_write():
+    # Without the index, so only the recent update ids stop the replay
+    db = _db(unique_index=False)
+    manager, auto_replies = _manager(db)
+
+    asyncio.run(_replay(manager, [[(1, 10), (2, 11), (1, 10), (2, 11)]]))
+
+    assert [doc["telegram_message_id"] for doc in db.messages.docs] == [10, 11]
+    assert db.chats.docs[0]["unread_count"] == 2
+    assert len(auto_replies) == 2
+
+
+def test_messages_are_stored_once_across_restarts():
+    db = _db()
+    manager, auto_replies = _manager(db)
+    asyncio.run(_replay(manager, [[(1, 10), (2, 11)]]))
+
+    # A restarted process has no memory of recent updates; the claims stop the replay
+    restarted, replayed_auto_replies = _manager(db)
+    asyncio.run(_replay(restarted, [[(1, 10), (2, 11), (3, 12)]]))
+
+    assert [doc["telegram_message_id"] for doc in db.messages.docs] == [10, 11, 12]
+    assert db.chats.docs[0]["unread_count"] == 3
+    assert len(auto_replies) == 2
+    assert len(replayed_auto_replies) == 1
+
+
+def test_same_message_id_in_group_and_private_chat_is_kept():
+    db = _db()
+    manager, _ = _manager(db)
+
+    async def run():
+        bot = _ManagedBot("1000:" + "x" * 35, IDENTITY)
+        application = manager._build_application(BOT_ID, bot)
+        await application.initialize()
+        await application.process_update(_update(bot, 1, 10, chat={"id": -500, "type": "group", "title": "G"}))
+        # Lower than the group's id, but new in the private chat
+        await application.process_update(_update(bot, 2, 9))
+        await application.process_update(_update(bot, 3, 10))
+        await application.shutdown()
+
+    asyncio.run(run())
+
+    assert len(db.messages.docs) == 3
+    assert db.chats.docs[0]["unread_count"] == 3
+    assert db.chats.docs[0]["counted_message_ids"] == {"-500": 10, "42": 10}
+
+
+def test_commands_are_not_answered_again_after_a_restart():
+    db = _db()
+    manager, sent = _manager(db)
+    asyncio.run(_replay(manager, [[(1, 10, "/start")]]))
+
+    restarted, replayed_sent = _manager(db)
+    asyncio.run(_replay(restarted, [[(1, 10, "/start")]]))
+
+    assert sent == ["/start"]
+    assert replayed_sent == []
+
+
+def test_unfinished_update_repairs_the_chat_without_replying_again():
+    db = _db()
+    manager, sent = _manager(db)
+
+    async def failing_insert(doc):
+        raise ConnectionError("lost the database")
+
+    # The process stops between storing the message and creating the chat
+    db.chats.insert_one = failing_insert
+    asyncio.run(_replay(manager, [[(1, 10)]]))
+    del db.chats.insert_one
+    assert db.chats.docs == [] and len(db.messages.docs) == 1
+
+    restarted, replayed_sent = _manager(db)
+    asyncio.run(_replay(restarted, [[(1, 10)]]))
+
+    assert db.chats.docs[0]["unread_count"] == 1
+    assert len(db.messages.docs) == 1
+    assert db.processed_updates.docs[0]["done"]
+    assert sent == [] and replayed_sent == []
+
+
+def test_unfinished_update_counts_the_message_once():
+    db = _db()
+    manager, _ = _manager(db)
+    asyncio.run(_replay(manager, [[(1, 10), (2, 11)]]))
+    # The process stopped after updating the chat but before finishing the claims
+    for claim in db.processed_updates.docs:
+        claim["done"] = False
+
+    restarted, replayed_sent = _manager(db)
+    asyncio.run(_replay(restarted, [[(1, 10), (2, 11)]]))
+
+    assert db.chats.docs[0]["unread_count"] == 2
+    assert replayed_sent == []
+
+
+def test_recent_updates_window_is_bounded():
+    recent = RecentUpdates(size=3)
+    assert [recent.add(update_id) for update_id in (1, 2, 3, 1)] == [True, True, True, False]
+    assert recent.add(4)
+    # 1 fell out of the window
+    assert recent.add(1)
+    assert not recent.add(4)
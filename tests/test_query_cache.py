@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from query_cache import QueryCache
+
+
+def test_concurrent_lookups_share_one_load():
+    cache = QueryCache(ttl=60, max_size=10)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def lookup():
+        results = await asyncio.gather(*(cache.get_or_load("key", loader) for _ in range(5)))
+        return results, await cache.get_or_load("key", loader)
+
+    results, cached = asyncio.run(lookup())
+    assert results == ["value"] * 5
+    assert cached == "value"
+    assert len(calls) == 1
+
+
+def test_cancelled_leader_does_not_cancel_waiters():
+    cache = QueryCache(ttl=60, max_size=10)
+
+    async def loader():
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def lookup():
+        leader = asyncio.create_task(cache.get_or_load("key", loader))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_load("key", loader))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(lookup()) == "value"
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    cache = QueryCache(ttl=60, max_size=10)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def lookup():
+        return await asyncio.gather(
+            *(cache.get_or_load("key", loader) for _ in range(3)), return_exceptions=True
+        )
+
+    for _ in range(2):
+        assert all(isinstance(result, RuntimeError) for result in asyncio.run(lookup()))
+    assert len(calls) == 2